@@ -0,0 +1,538 @@
+# Headless benchmarks for engine hot paths.
+# Run from the repo root: python Chess/benchmark.py [name]
+import ast
+import os
+import random
+import sys
+import tempfile
+import time
+import types
+import engine
+from bitboard import KING_ATTACKS, iterSquares
+from perft import perft
+from evaluation import PIECE_VALUES, TABLES_W, TABLES_B
+
+# positions reached from the start by coordinate moves
+BENCH_POSITIONS = {
+    'start':   [],
+    'italian': ['e2e4', 'e7e5', 'g1f3', 'b8c6', 'f1c4', 'f8c5'],
+    'middle':  ['d2d4', 'g8f6', 'c2c4', 'e7e6', 'b1c3', 'f8b4', 'e2e3', 'e8g8',
+                'f1d3', 'd7d5', 'g1f3', 'c7c5', 'e1g1', 'b8c6'],
+}
+
+def playMoves(gs, coords):
+    for coord in coords:
+        startCol, startRow = ord(coord[0]) - ord('a'), 8 - int(coord[1])
+        endCol, endRow = ord(coord[2]) - ord('a'), 8 - int(coord[3])
+        for move in gs.getValidMoves():
+            if (move.startRow, move.startCol, move.endRow, move.endCol) == (startRow, startCol, endRow, endCol):
+                gs.makeMove(move)
+                break
+        else:
+            raise ValueError(f"illegal move {coord}")
+    return gs
+
+def isSquareAttackedByMoveGen(gs, r, c, byWhite):
+    # the old approach - generate every attacker move and scan for the square
+    color = 'w' if byWhite else 'b'
+    moves = []
+    gs.getPawnMoves(color, moves)
+    gs.getKnightMoves(color, moves)
+    gs.getBishopMoves(color, moves)
+    gs.getRookMoves(color, moves)
+    gs.getQueenMoves(color, moves)
+    enemy = gs.colorBB['b' if byWhite else 'w']
+    for sq in iterSquares(gs.pieceBB[color + 'K']):
+        gs._addMoves(sq, KING_ATTACKS[sq] & ~gs.colorBB[color], enemy, moves)
+    target = r*8 + c
+    for move in moves:
+        if (move >> 6) & 63 == target:
+            return True
+    return False
+
+def benchAttacks(depth=3):
+    # perft with the direct attack query vs. the move generation scan
+    print(f"isSquareAttacked, perft depth {depth}")
+    for name, coords in BENCH_POSITIONS.items():
+        gs = playMoves(engine.ChessEngine(), coords)
+        t = time.perf_counter()
+        nodes = perft(gs, depth)
+        direct = time.perf_counter() - t
+
+        gs.isSquareAttacked = types.MethodType(isSquareAttackedByMoveGen, gs)
+        t = time.perf_counter()
+        oldNodes = perft(gs, depth)
+        scan = time.perf_counter() - t
+        del gs.isSquareAttacked
+
+        assert nodes == oldNodes, (name, nodes, oldNodes)
+        print(f"  {name:8} {nodes:8} nodes | direct {direct:7.3f}s | movegen scan {scan:7.3f}s | x{scan / direct:.1f}")
+
+def benchTT(depths=(3, 4)):
+    # MediumBot node counts with and without the transposition table
+    from bot import MediumBot
+    print("transposition table, MediumBot")
+    for depth in depths:
+        for name, coords in BENCH_POSITIONS.items():
+            row = f"  d{depth} {name:8}"
+            for sizeMB in (0, 16):
+                gs = playMoves(engine.ChessEngine(), coords)
+                bot = MediumBot(gs.whiteToMove, ttSizeMB=sizeMB)
+                bot.depth = depth
+                t = time.perf_counter()
+                move = bot.getMove(gs)
+                elapsed = time.perf_counter() - t
+                row += f" | {'tt' if sizeMB else 'no tt'} {bot.nodes:7} nodes {elapsed:6.2f}s {move.getNotation():6}"
+                if bot.tt is not None:
+                    stats = bot.tt.stats()
+                    row += f" hits {stats['hitRate']:5.1%} cutoffs {stats['cutoffRate']:5.1%}"
+            print(row)
+
+def evaluateByScan(gs):
+    # the old MediumBot evaluation - every square, a table lookup per piece
+    score = 0
+    for r in range(8):
+        for c in range(8):
+            piece = gs.board[r][c]
+            if piece == '--':
+                continue
+            table = TABLES_W[piece[1]] if piece[0] == 'w' else TABLES_B[piece[1]]
+            if piece[0] == 'w':
+                score += PIECE_VALUES[piece[1]] + table[r][c]
+            else:
+                score -= PIECE_VALUES[piece[1]] + table[r][c]
+    return score
+
+def benchEval(depth=5):
+    # leaf evaluation cost, and MediumBot nodes per second with the incremental score
+    from bot import MediumBot
+    print("evaluation, per call / MediumBot search")
+    for name, coords in BENCH_POSITIONS.items():
+        gs = playMoves(engine.ChessEngine(), coords)
+        n = 20000
+        t = time.perf_counter()
+        for _ in range(n):
+            evaluateByScan(gs)
+        scan = (time.perf_counter() - t) / n
+        t = time.perf_counter()
+        for _ in range(n):
+            gs.evaluate()
+        incremental = (time.perf_counter() - t) / n
+        bot = MediumBot(gs.whiteToMove)
+        bot.depth = depth
+        t = time.perf_counter()
+        bot.getMove(gs)
+        elapsed = time.perf_counter() - t
+        print(f"  {name:8} scan {scan * 1e6:6.2f}us | incremental {incremental * 1e6:5.2f}us | "
+              f"d{depth} {bot.nodes:7} nodes {bot.nodes / elapsed:7.0f} nps")
+
+def randomPositions(count, seed=1):
+    # positions from random playouts, for benchmarks that just need many different boards
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        gs = engine.ChessEngine()
+        for _ in range(rng.randint(4, 80)):
+            moves = gs.getLegalMoves()
+            if not moves:
+                break
+            gs.pushMove(rng.choice(moves))
+        positions.append(gs)
+    return positions
+
+_randomWeightsPath = None
+_randomNnuePath = None
+
+def hardModelPath():
+    # the trained weights aren't always there, throughput doesn't depend on them
+    global _randomWeightsPath
+    from hardBot import ChessNet, MODEL_PATH
+    import torch # type: ignore
+    if os.path.exists(MODEL_PATH):
+        return MODEL_PATH
+    if _randomWeightsPath is None:
+        # one file per run, so bots loaded later share the same network
+        print("  (no trained model, using random weights)")
+        _randomWeightsPath = os.path.join(tempfile.mkdtemp(), 'random_weights.pth')
+        torch.save(ChessNet().state_dict(), _randomWeightsPath)
+    return _randomWeightsPath
+
+def loadHardBot(**options):
+    from hardBot import HardBot
+    return HardBot(True, modelPath=hardModelPath(), **options)
+
+def benchBatch(batchSizes=(1, 16, 64, 256), count=1024, depth=3):
+    # HardBot network throughput by batch size (CPU), then a search with and without batching
+    import torch # type: ignore
+    from encoding import bitboards
+    print("batched network evaluation, HardBot")
+    bot = loadHardBot()
+    bot.device = torch.device('cpu')
+    bot.model.to(bot.device)
+    positions = randomPositions(count)
+    rows = [bitboards(gs) for gs in positions]
+    keys = [gs.zobristKey for gs in positions]
+    for size in batchSizes:
+        bot.evalCache.clear()
+        t = time.perf_counter()
+        for i in range(0, count, size):
+            bot.evaluateMany(keys[i:i + size], rows[i:i + size])
+        elapsed = time.perf_counter() - t
+        print(f"  batch {size:4} {count / elapsed:9.0f} pos/s")
+    for size in (1, 64):
+        bot.batchSize, bot.batchLeaves = size, size > 1
+        bot.depth = depth
+        bot.tt.clear()
+        bot.evalCache.clear()  # each search starts cold, not on the scores of the one before
+        gs = playMoves(engine.ChessEngine(), BENCH_POSITIONS['italian'])
+        t = time.perf_counter()
+        move = bot.getMove(gs)
+        elapsed = time.perf_counter() - t
+        print(f"  search d{depth} batch {size:3} {bot.nodes:6} nodes {elapsed:6.2f}s {move.getNotation()}")
+
+def loadPrepareDataEncoder():
+    # boardToTensor from modelTraining/prepareData.py - the script parses PGNs when imported,
+    # so only its function definition is taken
+    path = os.path.join(os.path.dirname(__file__), 'modelTraining', 'prepareData.py')
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    func = next(node for node in tree.body if isinstance(node, ast.FunctionDef) and node.name == 'boardToTensor')
+    import numpy as np # type: ignore
+    import chess # type: ignore
+    namespace = {'np': np, 'chess': chess}
+    exec(compile(ast.Module([func], type_ignores=[]), path, 'exec'), namespace)
+    return namespace['boardToTensor']
+
+def gsToCBoard(gs):
+    # python-chess board with the same pieces, the way HardBot used to build it
+    import chess # type: ignore
+    board = chess.Board()
+    board.clear()
+    piece_map = {'P': chess.PAWN,   'N': chess.KNIGHT, 'B': chess.BISHOP,
+                 'R': chess.ROOK,   'Q': chess.QUEEN,  'K': chess.KING}
+    for r in range(8):
+        for c in range(8):
+            p = gs.board[r][c]
+            if p != '--':
+                sq    = chess.square(c, 7 - r)
+                color = chess.WHITE if p[0] == 'w' else chess.BLACK
+                board.set_piece_at(sq, chess.Piece(piece_map[p[1]], color))
+    board.turn = chess.WHITE if gs.whiteToMove else chess.BLACK
+    return board
+
+def benchEncoding(count=2000):
+    # direct bitboard encoder vs the python-chess round trip, must be bit-identical
+    import numpy as np # type: ignore
+    from encoding import PlaneEncoder, bitboards
+    print("network input encoding")
+    boardToTensor = loadPrepareDataEncoder()
+    positions = randomPositions(count, seed=2)
+    encoder = PlaneEncoder(64)
+
+    t = time.perf_counter()
+    reference = [boardToTensor(gsToCBoard(gs)) for gs in positions]
+    old = (time.perf_counter() - t) / count
+
+    mismatches = sum(not np.array_equal(encoder.encode(gs)[0], ref) for gs, ref in zip(positions, reference))
+    for i in range(0, count, 64):
+        batch = encoder.encodeMany([bitboards(gs) for gs in positions[i:i + 64]])
+        mismatches += sum(not np.array_equal(batch[j], reference[i + j]) for j in range(len(batch)))
+    assert mismatches == 0, f"{mismatches} positions encode differently"
+    print(f"  {count} positions identical to prepareData.boardToTensor")
+
+    t = time.perf_counter()
+    for gs in positions:
+        encoder.encode(gs)
+    single = (time.perf_counter() - t) / count
+    t = time.perf_counter()
+    for i in range(0, count, 64):
+        encoder.encodeMany([bitboards(gs) for gs in positions[i:i + 64]])
+    batched = (time.perf_counter() - t) / count
+    print(f"  python-chess round trip {old * 1e6:7.1f}us | direct {single * 1e6:5.1f}us | "
+          f"direct, batches of 64 {batched * 1e6:5.1f}us  per position")
+
+def benchEvalCache(depth=3):
+    # hit rate of the HardBot evaluation cache over a short game, then a fresh bot reusing the saved file
+    print("network evaluation cache, HardBot")
+    path = os.path.join(tempfile.mkdtemp(), 'eval_cache.bin')
+    coords = BENCH_POSITIONS['middle']
+    for session in ('first session', 'loaded from disk'):
+        bot = loadHardBot(evalCachePath=path)
+        bot.depth = depth
+        loaded = len(bot.evalCache)
+        gs = engine.ChessEngine()
+        t = time.perf_counter()
+        for i in range(0, len(coords), 2):
+            playMoves(gs, coords[i:i + 2])
+            bot.getMove(gs)
+        elapsed = time.perf_counter() - t
+        stats = bot.evalCache.stats()
+        bot.close()
+        print(f"  {session:16} {loaded:6} loaded  {stats['hits']:6} hits {stats['misses']:6} misses "
+              f"hit rate {stats['hitRate']:5.1%}  {elapsed:6.2f}s")
+
+def benchInference(count=2000, batchSizes=(1, 64)):
+    # every inference mode against the float model on positions the network never trained on
+    import torch # type: ignore
+    from encoding import PlaneEncoder, bitboards
+    from inference import INFERENCE_MODES
+    print("HardBot inference modes, CPU")
+    positions = randomPositions(count, seed=3)
+    planes = torch.from_numpy(PlaneEncoder(count).encodeMany([bitboards(gs) for gs in positions]).copy())
+    # best child of each of the first 200 positions, the choice a depth 1 search would make -
+    # scores are white's point of view, so white takes the highest and black the lowest
+    roots = positions[:200]
+    whiteRoots = [gs.whiteToMove for gs in roots]
+    children = []
+    for gs in roots:
+        codes = gs.getLegalMoves()
+        rows = []
+        for code in codes:
+            gs.pushMove(code)
+            rows.append(bitboards(gs))
+            gs.popMove()
+        children.append(torch.from_numpy(PlaneEncoder(len(rows)).encodeMany(rows).copy()) if rows else None)
+
+    reference = bestMoves = None
+    for mode in INFERENCE_MODES:
+        bot = loadHardBot(inference=mode)
+        model = bot.model
+        with torch.no_grad():
+            scores = model(planes)
+            best = [None if x is None else int(model(x).argmax() if white else model(x).argmin())
+                    for x, white in zip(children, whiteRoots)]
+            speeds = []
+            for size in batchSizes:
+                batch = planes[:size]
+                model(batch)
+                t = time.perf_counter()
+                for i in range(0, count, size):
+                    model(planes[i:i + size])
+                speeds.append(count / (time.perf_counter() - t))
+        if reference is None:
+            reference, bestMoves = scores, best
+        error = (scores - reference).abs() * 10000  # in HardBot.evaluateBoard units
+        agree = sum(a == b for a, b in zip(best, bestMoves)) / len(roots)
+        speed = '  '.join(f"batch {size:3} {s:7.0f} pos/s" for size, s in zip(batchSizes, speeds))
+        print(f"  {mode:6} {speed}  error mean {error.mean():6.2f} max {error.max():6.2f}  "
+              f"same best move {agree:6.1%}")
+
+STARTUP_SCRIPT = """
+import json, resource, sys, time
+t = time.perf_counter()
+import main  # everything the game imports before the menu shows
+imported = time.perf_counter() - t
+import bot
+mode, options = sys.argv[1], json.loads(sys.argv[2])
+t = time.perf_counter()
+if mode != 'local':
+    bot.createBot(mode, True, **options)
+created = time.perf_counter() - t
+print(json.dumps({'import': imported, 'create': created, 'torch': 'torch' in sys.modules,
+                  'rssMB': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+def benchStartup(runs=3):
+    # each mode in a fresh interpreter: game imports, bot creation, peak memory
+    import json
+    import subprocess
+    print("startup by mode, fresh process, best of", runs)
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1')
+    here = os.path.dirname(os.path.abspath(__file__))
+    for mode in ('local', 'easy', 'medium', 'hard'):
+        options = {'modelPath': hardModelPath()} if mode == 'hard' else {}
+        best = None
+        for _ in range(runs):
+            t = time.perf_counter()
+            out = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT, mode, json.dumps(options)],
+                                 cwd=here, env=env, capture_output=True, text=True, check=True).stdout
+            total = time.perf_counter() - t
+            result = json.loads(out.strip().splitlines()[-1])
+            if best is None or total < best[0]:
+                best = (total, result)
+        total, r = best
+        print(f"  {mode:6} total {total:5.2f}s  imports {r['import']:5.2f}s  bot {r['create']:5.2f}s  "
+              f"peak RSS {r['rssMB']:6.0f} MB  torch {'loaded' if r['torch'] else 'not loaded'}")
+
+def nnueModelPath():
+    # like hardModelPath, random weights at PyTorch's default init scale when nothing is trained
+    global _randomNnuePath
+    import numpy as np # type: ignore
+    from nnueBot import NNUE_PATH, FEATURES
+    if os.path.exists(NNUE_PATH):
+        return NNUE_PATH
+    if _randomNnuePath is None:
+        print("  (no trained NNUE, using random weights)")
+        rng = np.random.default_rng(1)
+        def layer(fanIn, *shape):
+            bound = 1 / fanIn ** 0.5
+            return rng.uniform(-bound, bound, shape).astype(np.float32)
+        _randomNnuePath = os.path.join(tempfile.mkdtemp(), 'random_nnue.npz')
+        np.savez(_randomNnuePath, ftWeight=layer(FEATURES, FEATURES, 256), ftBias=layer(FEATURES, 256),
+                 l1Weight=layer(256, 32, 256), l1Bias=layer(256, 32),
+                 outWeight=layer(32, 32), outBias=layer(32))
+    return _randomNnuePath
+
+def benchNnue(games=40, plies=80, depth=4):
+    # incremental accumulator vs a full refresh, quantization error, eval and search speed
+    import numpy as np # type: ignore
+    from nnueBot import NnueBot, NnueNetwork, featureIndex, QA
+    print("NNUE evaluation")
+    path = nnueModelPath()
+    network = NnueNetwork(path)
+    with np.load(path) as w:
+        weights = {k: w[k] for k in w.files}
+
+    def floatEval(gs):
+        # the unquantized network, from scratch
+        x = weights['ftBias'].copy()
+        for r in range(8):
+            for c in range(8):
+                if gs.board[r][c] != '--':
+                    x += weights['ftWeight'][featureIndex(gs.board[r][c], r * 8 + c)]
+        h = np.maximum(weights['l1Weight'] @ np.clip(x, 0, 1) + weights['l1Bias'], 0)
+        return float(np.tanh(weights['outWeight'] @ h + weights['outBias']))
+
+    rng = random.Random(7)
+    checked, maxError = 0, 0.0
+    for _ in range(games):
+        gs = engine.ChessEngine()
+        acc = network.attach(gs)
+        for _ in range(plies):
+            moves = gs.getLegalMoves()
+            if not moves:
+                break
+            gs.pushMove(rng.choice(moves))
+            values = acc.values.copy()
+            acc.refresh(gs)
+            assert np.array_equal(values, acc.values), "incremental accumulator differs from a refresh"
+            if checked % 10 == 0:
+                maxError = max(maxError, abs(network.evaluate(acc.values) - floatEval(gs)))
+            checked += 1
+        gs.unwindTo(0)
+        start = network.attach(engine.ChessEngine()).values
+        assert np.array_equal(acc.values, start), "undoing every move didn't restore the accumulator"
+    print(f"  {checked} positions, incremental == refresh, max error vs float network "
+          f"{maxError * 10000:.1f} (score units, QA={QA})")
+
+    gs = playMoves(engine.ChessEngine(), BENCH_POSITIONS['middle'])
+    moves = gs.getLegalMoves()
+    n = 2000
+    t = time.perf_counter()
+    for _ in range(n // len(moves) + 1):
+        for m in moves:
+            gs.pushMove(m)
+            gs.popMove()
+    plain = (time.perf_counter() - t) / (len(moves) * (n // len(moves) + 1))
+    acc = network.attach(gs)
+    t = time.perf_counter()
+    for _ in range(n // len(moves) + 1):
+        for m in moves:
+            gs.pushMove(m)
+            gs.popMove()
+    updated = (time.perf_counter() - t) / (len(moves) * (n // len(moves) + 1))
+    t = time.perf_counter()
+    for _ in range(n):
+        network.evaluate(acc.values)
+    evalTime = (time.perf_counter() - t) / n
+    t = time.perf_counter()
+    for _ in range(n // 10):
+        acc.refresh(gs)
+    refresh = (time.perf_counter() - t) / (n // 10)
+    gs.accumulator = None
+    print(f"  push+pop {plain * 1e6:5.1f}us plain, {updated * 1e6:5.1f}us with accumulator | "
+          f"evaluate {evalTime * 1e6:5.1f}us | full refresh {refresh * 1e6:5.1f}us")
+
+    bots = [('nnue', NnueBot(True, depth=depth, modelPath=path))]
+    hard = loadHardBot()
+    hard.depth = depth
+    bots.append(('hard', hard))
+    for name, bot in bots:
+        gs = playMoves(engine.ChessEngine(), BENCH_POSITIONS['italian'])
+        t = time.perf_counter()
+        move = bot.getMove(gs)
+        elapsed = time.perf_counter() - t
+        print(f"  {name:5} d{depth} {bot.nodes:7} nodes {elapsed:6.2f}s {bot.nodes / elapsed:7.0f} nodes/s "
+              f"{move.getNotation()}")
+
+def benchSmp(workerCounts=(1, 2, 4, 8), depth=5, games=2, moveTime=0.3):
+    # Lazy SMP: time to a fixed depth, then games against the single process bot at equal time
+    from bot import createBot, MOVES_TO_GO
+    from match import OPENINGS, playGame
+    print(f"Lazy SMP, MediumBot ({os.cpu_count()} cores available)")
+    base = None
+    for workers in workerCounts:
+        bot = createBot('medium', True, workers=workers)
+        if bot.smp is not None:
+            bot.smp.waitReady()
+        bot.depth = depth
+        elapsed = 0
+        for name in ('italian', 'middle'):
+            bot.tt.clear()
+            gs = playMoves(engine.ChessEngine(), BENCH_POSITIONS[name])
+            t = time.perf_counter()
+            bot.getMove(gs)
+            elapsed += time.perf_counter() - t
+        base = base or elapsed
+        line = f"  {workers} workers  d{depth} {elapsed:6.2f}s  speedup {base / elapsed:4.2f}x"
+        if workers > 1 and games:
+            single = createBot('medium', False)
+            points = 0
+            for g in range(games):
+                _, fen = OPENINGS[g // 2 % len(OPENINGS)]
+                # same opening with colours swapped every second game, a clock of about moveTime per move
+                bot.playAsWhite = single.playAsWhite = g % 2 == 0
+                if g % 2 == 0:
+                    points += playGame(bot, single, fen, moveTime * MOVES_TO_GO, 0, maxPlies=120)[0]
+                else:
+                    points += 1 - playGame(single, bot, fen, moveTime * MOVES_TO_GO, 0, maxPlies=120)[0]
+            line += f"  vs 1 worker {points}/{games}"
+        print(line)
+        bot.close()
+
+def benchFen(count=2000):
+    # load and export speed, validated loads vs the fast path, on positions from random games
+    print("FEN load / export")
+    fens = [gs.getFen() for gs in randomPositions(count, seed=4)]
+    gs = engine.ChessEngine()
+    for fen in fens:
+        gs.loadFen(fen)
+        assert gs.getFen() == fen, fen
+    print(f"  {count} positions round trip")
+    t = time.perf_counter()
+    for fen in fens:
+        engine.ChessEngine(fen)
+    new = (time.perf_counter() - t) / count
+    t = time.perf_counter()
+    for fen in fens:
+        gs.loadFen(fen)
+    validated = (time.perf_counter() - t) / count
+    t = time.perf_counter()
+    for fen in fens:
+        gs.loadFen(fen, validate=False)
+    fast = (time.perf_counter() - t) / count
+    t = time.perf_counter()
+    for _ in range(count):
+        gs.getFen()
+    export = (time.perf_counter() - t) / count
+    print(f"  new engine {new * 1e6:6.1f}us | loadFen {validated * 1e6:6.1f}us | "
+          f"validate=False {fast * 1e6:6.1f}us | getFen {export * 1e6:5.1f}us  per position")
+
+BENCHMARKS = {
+    'attacks': benchAttacks,
+    'tt':      benchTT,
+    'eval':    benchEval,
+    'batch':   benchBatch,
+    'encoding': benchEncoding,
+    'evalcache': benchEvalCache,
+    'inference': benchInference,
+    'startup': benchStartup,
+    'nnue': benchNnue,
+    'smp': benchSmp,
+    'fen': benchFen,
+}
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
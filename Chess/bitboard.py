@@ -0,0 +1,126 @@
+# Bitboard helpers and precomputed attack tables.
+# Square index = row * 8 + col, same layout as ChessEngine.board
+# (row 0 is rank 8, so a8 = 0 and h1 = 63).
+
+FULL = (1 << 64) - 1
+SQUARE_BB = [1 << sq for sq in range(64)]
+
+# (dRow, dCol)
+KNIGHT_DIRS = [(-2,-1), (-2,1), (-1,-2), (-1,2), (1,-2), (1,2), (2,-1), (2,1)]
+KING_DIRS   = [(-1,0), (1,0), (0,-1), (0,1), (-1,-1), (-1,1), (1,-1), (1,1)]
+ROOK_DIRS   = [(-1,0), (1,0), (0,-1), (0,1)]
+BISHOP_DIRS = [(-1,-1), (-1,1), (1,-1), (1,1)]
+
+def squareBB(r, c):
+    return 1 << (r * 8 + c)
+
+def iterSquares(bb):
+    # yields square indices of all set bits, lowest first
+    while bb:
+        lsb = bb & -bb
+        yield lsb.bit_length() - 1
+        bb ^= lsb
+
+def popCount(bb):
+    return bin(bb).count('1')
+
+def _stepAttacks(sq, dirs):
+    r, c = divmod(sq, 8)
+    bb = 0
+    for dr, dc in dirs:
+        row, col = r + dr, c + dc
+        if 0 <= row <= 7 and 0 <= col <= 7:
+            bb |= 1 << (row * 8 + col)
+    return bb
+
+def _rayAttacks(sq, dirs, occ):
+    # slow reference walk, only used to fill the lookup tables
+    r, c = divmod(sq, 8)
+    bb = 0
+    for dr, dc in dirs:
+        row, col = r + dr, c + dc
+        while 0 <= row <= 7 and 0 <= col <= 7:
+            bit = 1 << (row * 8 + col)
+            bb |= bit
+            if occ & bit:
+                break
+            row += dr
+            col += dc
+    return bb
+
+def _relevantMask(sq, dirs):
+    # squares on the line whose occupancy changes the attack set (edges don't)
+    r, c = divmod(sq, 8)
+    bb = 0
+    for dr, dc in dirs:
+        row, col = r + dr, c + dc
+        while 0 <= row + dr <= 7 and 0 <= col + dc <= 7:
+            bb |= 1 << (row * 8 + col)
+            row += dr
+            col += dc
+    return bb
+
+KNIGHT_ATTACKS = [_stepAttacks(sq, KNIGHT_DIRS) for sq in range(64)]
+KING_ATTACKS   = [_stepAttacks(sq, KING_DIRS) for sq in range(64)]
+# PAWN_ATTACKS['w'][sq] - squares a white pawn on sq attacks
+PAWN_ATTACKS = {
+    'w': [_stepAttacks(sq, [(-1,-1), (-1,1)]) for sq in range(64)],
+    'b': [_stepAttacks(sq, [(1,-1), (1,1)]) for sq in range(64)],
+}
+
+# sliding pieces: one lookup per line through the square (rank, file, diagonal, anti-diagonal),
+# keyed by the occupancy of that line's relevant squares
+_LINES = {
+    'rank':     [(0,-1), (0,1)],
+    'file':     [(-1,0), (1,0)],
+    'diag':     [(-1,-1), (1,1)],
+    'antiDiag': [(-1,1), (1,-1)],
+}
+
+def _buildLineTables(dirs):
+    masks = []
+    tables = []
+    for sq in range(64):
+        mask = _relevantMask(sq, dirs)
+        table = {}
+        sub = 0
+        while True:  # enumerate every subset of mask
+            table[sub] = _rayAttacks(sq, dirs, sub)
+            sub = (sub - mask) & mask
+            if sub == 0:
+                break
+        masks.append(mask)
+        tables.append(table)
+    return masks, tables
+
+RANK_MASK, RANK_ATTACKS           = _buildLineTables(_LINES['rank'])
+FILE_MASK, FILE_ATTACKS           = _buildLineTables(_LINES['file'])
+DIAG_MASK, DIAG_ATTACKS           = _buildLineTables(_LINES['diag'])
+ANTI_DIAG_MASK, ANTI_DIAG_ATTACKS = _buildLineTables(_LINES['antiDiag'])
+
+def rookAttacks(sq, occ):
+    return RANK_ATTACKS[sq][occ & RANK_MASK[sq]] | FILE_ATTACKS[sq][occ & FILE_MASK[sq]]
+
+def bishopAttacks(sq, occ):
+    return DIAG_ATTACKS[sq][occ & DIAG_MASK[sq]] | ANTI_DIAG_ATTACKS[sq][occ & ANTI_DIAG_MASK[sq]]
+
+def queenAttacks(sq, occ):
+    return rookAttacks(sq, occ) | bishopAttacks(sq, occ)
+
+def _buildBetween():
+    # BETWEEN[a][b] - squares strictly between a and b if they share a line, else 0
+    between = [[0] * 64 for _ in range(64)]
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        for dr, dc in ROOK_DIRS + BISHOP_DIRS:
+            row, col = r + dr, c + dc
+            path = 0
+            while 0 <= row <= 7 and 0 <= col <= 7:
+                to = row * 8 + col
+                between[sq][to] = path
+                path |= 1 << to
+                row += dr
+                col += dc
+    return between
+
+BETWEEN = _buildBetween()
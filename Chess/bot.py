@@ -1,46 +1,31 @@
+import json
 import random
 import time
-import torch # type: ignore
-import torch.nn as nn # type: ignore
-import numpy as np # type: ignore
-import chess # type: ignore
-import os
+from move import Move, FLAG_EN_PASSANT, FLAG_PROMOTION, PROMOTION_PIECES
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+from evaluation import PIECE_VALUES
+from ordering import MoveOrderer, sortCaptures, MAX_PLY, TACTICAL
 
 class EasyBot:
     def __init__(self, playAsWhite):
         self.playAsWhite = playAsWhite
 
-    def getMove(self, gs):
-        savedFlags = (gs.whiteKingMoved, gs.blackKingMoved,
-                      gs.whiteKingsRookMoved, gs.whiteQueensRookMoved,
-                      gs.blackKingsRookMoved, gs.blackQueensRookMoved,
-                      gs.enPassantTarget)
-        moves = gs.getValidMoves()
+    def getMove(self, gs, timeLeft=None, increment=0):
+        # only queen promotions, like before under-promotions were generated
+        moves = [m for m in gs.getValidMoves() if not m.promotionPending or m.promotionPiece[1] == 'Q']
         # prefer checkmate
         for move in moves:
             gs.makeMove(move)
             if gs.checkmate:
                 gs.undoMove()
-                (gs.whiteKingMoved, gs.blackKingMoved,
-                 gs.whiteKingsRookMoved, gs.whiteQueensRookMoved,
-                 gs.blackKingsRookMoved, gs.blackQueensRookMoved,
-                 gs.enPassantTarget) = savedFlags
                 return move
             gs.undoMove()
-            (gs.whiteKingMoved, gs.blackKingMoved,
-             gs.whiteKingsRookMoved, gs.whiteQueensRookMoved,
-             gs.blackKingsRookMoved, gs.blackQueensRookMoved,
-             gs.enPassantTarget) = savedFlags
 
         def isSafe(move):
             # returns True if piece wont be hanging after move
             gs.makeMove(move)
             safe = not gs.isSquareAttacked(move.endRow, move.endCol, byWhite=not self.playAsWhite)
             gs.undoMove()
-            (gs.whiteKingMoved, gs.blackKingMoved,
-             gs.whiteKingsRookMoved, gs.whiteQueensRookMoved,
-             gs.blackKingsRookMoved, gs.blackQueensRookMoved,
-             gs.enPassantTarget) = savedFlags
             return safe
 
         # prefer safe captures with material gain
@@ -77,320 +62,409 @@ class EasyBot:
 
         return random.choice(pool)
 
-PIECE_VALUES = {'P': 100, 'N': 320, 'B': 330, 'R': 500, 'Q': 900, 'K': 0}
-
-PAWN_TABLE_W = [
-    [0,  0,  0,  0,  0,  0,  0,  0],
-    [50, 50, 50, 50, 50, 50, 50, 50],
-    [10, 10, 20, 30, 30, 20, 10, 10],
-    [5,  5, 10, 25, 25, 10,  5,  5],
-    [0,  0,  0, 20, 20,  0,  0,  0],
-    [5, -5,-10,  0,  0,-10, -5,  5],
-    [5, 10, 10,-20,-20, 10, 10,  5],
-    [0,  0,  0,  0,  0,  0,  0,  0],
-]
-PAWN_TABLE_B = PAWN_TABLE_W[::-1]
-
-KNIGHT_TABLE = [
-    [-50,-40,-30,-30,-30,-30,-40,-50],
-    [-40,-20,  0,  0,  0,  0,-20,-40],
-    [-30,  0, 10, 15, 15, 10,  0,-30],
-    [-30,  5, 15, 20, 20, 15,  5,-30],
-    [-30,  0, 15, 20, 20, 15,  0,-30],
-    [-30,  5, 10, 15, 15, 10,  5,-30],
-    [-40,-20,  0,  5,  5,  0,-20,-40],
-    [-50,-40,-30,-30,-30,-30,-40,-50],
-]
-
-BISHOP_TABLE = [
-    [-20,-10,-10,-10,-10,-10,-10,-20],
-    [-10,  0,  0,  0,  0,  0,  0,-10],
-    [-10,  0,  5, 10, 10,  5,  0,-10],
-    [-10,  5,  5, 10, 10,  5,  5,-10],
-    [-10,  0, 10, 10, 10, 10,  0,-10],
-    [-10, 10, 10, 10, 10, 10, 10,-10],
-    [-10,  5,  0,  0,  0,  0,  5,-10],
-    [-20,-10,-10,-10,-10,-10,-10,-20],
-]
-
-ROOK_TABLE = [
-    [0,  0,  0,  0,  0,  0,  0,  0],
-    [5, 10, 10, 10, 10, 10, 10,  5],
-    [-5,  0,  0,  0,  0,  0,  0, -5],
-    [-5,  0,  0,  0,  0,  0,  0, -5],
-    [-5,  0,  0,  0,  0,  0,  0, -5],
-    [-5,  0,  0,  0,  0,  0,  0, -5],
-    [-5,  0,  0,  0,  0,  0,  0, -5],
-    [0,  0,  0,  5,  5,  0,  0,  0],
-]
-
-QUEEN_TABLE = [
-    [-20,-10,-10, -5, -5,-10,-10,-20],
-    [-10,  0,  0,  0,  0,  0,  0,-10],
-    [-10,  0,  5,  5,  5,  5,  0,-10],
-    [-5,   0,  5,  5,  5,  5,  0, -5],
-    [0,    0,  5,  5,  5,  5,  0, -5],
-    [-10,  5,  5,  5,  5,  5,  0,-10],
-    [-10,  0,  5,  0,  0,  0,  0,-10],
-    [-20,-10,-10, -5, -5,-10,-10,-20],
-]
-
-KING_TABLE_MID = [
-    [-30,-40,-40,-50,-50,-40,-40,-30],
-    [-30,-40,-40,-50,-50,-40,-40,-30],
-    [-30,-40,-40,-50,-50,-40,-40,-30],
-    [-30,-40,-40,-50,-50,-40,-40,-30],
-    [-20,-30,-30,-40,-40,-30,-30,-20],
-    [-10,-20,-20,-20,-20,-20,-20,-10],
-    [20,  20,  0,  0,  0,  0, 20, 20],
-    [20,  30, 10,  0,  0, 10, 30, 20],
-]
-KING_TABLE_MID_B = KING_TABLE_MID[::-1]
-
-TABLES_W = {'P': PAWN_TABLE_W, 'N': KNIGHT_TABLE, 'B': BISHOP_TABLE,
-            'R': ROOK_TABLE,   'Q': QUEEN_TABLE,   'K': KING_TABLE_MID}
-TABLES_B = {'P': PAWN_TABLE_B, 'N': KNIGHT_TABLE, 'B': BISHOP_TABLE,
-            'R': ROOK_TABLE,   'Q': QUEEN_TABLE,   'K': KING_TABLE_MID_B}
-
-def createBot(mode, playAsWhite):
+def captureGain(gs, code):
+    # material the move wins at most: captured piece plus promotion
+    board = gs.board
+    endSq, flag = (code >> 6) & 63, code >> 12
+    gain = 0
+    if code & 0x4000:
+        gain += PIECE_VALUES['P' if flag == FLAG_EN_PASSANT else board[endSq >> 3][endSq & 7][1]]
+    if flag & FLAG_PROMOTION:
+        gain += PIECE_VALUES[PROMOTION_PIECES[flag & 3]] - PIECE_VALUES['P']
+    return gain
+
+def hasPieces(gs, color):
+    # anything besides pawns and the king
+    bb = gs.pieceBB
+    return bool(bb[color + 'N'] | bb[color + 'B'] | bb[color + 'R'] | bb[color + 'Q'])
+
+# mate scores count plies from the root, which moves by two every getMove while the table
+# lasts the whole game - stored, they count from the node instead, and are converted back on probe
+def scoreToTT(score, ply):
+    if score >= MATE_SCORE - MAX_PLY:
+        return score + ply
+    if score <= -MATE_SCORE + MAX_PLY:
+        return score - ply
+    return score
+
+def scoreFromTT(score, ply):
+    if score >= MATE_SCORE - MAX_PLY:
+        return score - ply
+    if score <= -MATE_SCORE + MAX_PLY:
+        return score + ply
+    return score
+
+def ttBound(entry, depth, alpha, beta, ply):
+    # narrow the window with a stored result, returns a score when the node is already decided
+    ttDepth, bound, score, _ = entry
+    if ttDepth < depth:
+        return None, alpha, beta
+    score = scoreFromTT(score, ply)
+    if bound == EXACT:
+        return score, alpha, beta
+    if bound == LOWER:
+        alpha = max(alpha, score)
+    else:
+        beta = min(beta, score)
+    return (score if alpha >= beta else None), alpha, beta
+
+def ttStore(tt, key, depth, score, move, alphaOrig, betaOrig, ply):
+    if score <= alphaOrig:
+        bound = UPPER
+    elif score >= betaOrig:
+        bound = LOWER
+    else:
+        bound = EXACT
+    tt.store(key, depth, bound, scoreToTT(score, ply), move)
+
+MATE_SCORE = 99999
+DELTA_MARGIN = 200  # a capture has to be able to get this close to alpha to be searched
+MAX_DEPTH = 32
+ASPIRATION_WINDOW = 50
+ASPIRATION_MIN_DEPTH = 4
+NULL_MIN_DEPTH = 3
+NULL_REDUCTION = 2
+LMR_MIN_DEPTH = 3
+LMR_MIN_MOVES = 4  # moves searched at full depth before reducing
+MOVES_TO_GO = 30  # assumed moves left in the game when splitting the clock
+
+class SearchTimeout(Exception):
+    pass
+
+def allocateTime(timeLeft, increment):
+    # seconds for this move: soft - don't start another iteration, hard - abort the search
+    reserve = min(1.0, timeLeft * 0.05)  # lag, rendering, the bot's move delay
+    usable = max(0.0, timeLeft - reserve)
+    hard = usable * 0.3
+    soft = min(usable / MOVES_TO_GO + increment * 0.8, hard)
+    hard = min(hard, soft * 3)
+    return soft, hard
+
+def createBot(mode, playAsWhite, workers=1, statsLog=None, **options):
+    # options go to the search bots, e.g. ttSizeMB, maxDepth.
+    # workers > 1 - Lazy SMP with workers - 1 helper processes, see parallel.py
+    # statsLog - file the search bots append each move's statistics to, one JSON object per line
     if mode == 'easy':
         return EasyBot(playAsWhite)
     elif mode == 'medium':
-        return MediumBot(playAsWhite)
+        bot = MediumBot(playAsWhite, **options)
     elif mode == 'hard':
-        return HardBot(playAsWhite)
-    return None
-
-class MediumBot:
-    def __init__(self, playAsWhite):
+        # torch is only imported once a Hard bot is wanted
+        from hardBot import HardBot
+        bot = HardBot(playAsWhite, **options)
+    elif mode == 'nnue':
+        from nnueBot import NnueBot
+        bot = NnueBot(playAsWhite, **options)
+    else:
+        return None
+    if workers > 1:
+        from parallel import LazySMP
+        bot.smp = LazySMP(type(bot), playAsWhite, options, workers - 1, options.get('ttSizeMB', 16) or 16)
+        bot.tt = bot.smp.tt
+    bot.statsLog = statsLog
+    return bot
+
+class SearchBot:
+    # negamax search shared by MediumBot and HardBot: iterative deepening with aspiration
+    # windows, PVS, late move reductions, null-move pruning and quiescence.
+    # Subclasses provide evaluateBoard (white's point of view).
+    deltaMargin = DELTA_MARGIN  # None turns delta pruning off
+    aspirationWindow = ASPIRATION_WINDOW
+    batchLeaves = False  # call prefetch with the children of depth 1 nodes that don't cut off at once
+
+    def __init__(self, playAsWhite, depth, ttSizeMB=16, maxDepth=MAX_DEPTH):
         self.playAsWhite = playAsWhite
-        self.depth = 3
-    
-    def evaluateBoard(self, gs):
-        score = 0
-        for r in range(8):
-            for c in range(8):
-                piece = gs.board[r][c]
-                if piece == '--':
-                    continue
-                color    = piece[0]
-                ptype    = piece[1]
-                val      = PIECE_VALUES[ptype]
-                table    = TABLES_W[ptype] if color == 'w' else TABLES_B[ptype]
-                posBonus = table[r][c]
-                if color == 'w':
-                    score += val + posBonus
-                else:
-                    score -= val + posBonus
-        return score
-    def orderMoves(self, moves, gs):
-        # sort moves: captures first (MVV-LVA), then others
-        def score(move):
-            s = 0
-            if move.pieceCaptured != '--':
-                s += 10 * PIECE_VALUES.get(move.pieceCaptured[1], 0) - PIECE_VALUES.get(move.pieceMoved[1], 0)
-            if move.promotionPending:
-                s += 900
-            return s
-        return sorted(moves, key=score, reverse=True)
-    
-    def minimax(self, gs, depth, alpha, beta, maximizing):
-        if depth == 0:
-            return self.evaluateBoard(gs), None
-
-        # save castling flags before searching
-        savedFlags = (gs.whiteKingMoved, gs.blackKingMoved,
-                      gs.whiteKingsRookMoved, gs.whiteQueensRookMoved,
-                      gs.blackKingsRookMoved, gs.blackQueensRookMoved,
-                      gs.enPassantTarget)
-
-        moves = self.orderMoves(gs.getValidMoves(), gs)
-        if not moves:
-            if gs.checkmate:
-                return (-99999 if maximizing else 99999), None
-            return 0, None # stalemate
-
+        self.depth = depth  # fixed depth when no clock is given
+        self.maxDepth = maxDepth
+        # kept for the whole game, so later moves reuse earlier searches
+        self.tt = TranspositionTable(ttSizeMB) if ttSizeMB else None
+        self.deadline = float('inf')
+        self.completedDepth = 0
+        self.lastScore = 0  # for the side the bot played
+        self.stopEvent = None  # set from another thread/process to abort the search
+        self.orderer = MoveOrderer()
+        self.rootPly = 0  # undo stack size at the root, ply = distance from it
+        self.rootMove = None
+        self.smp = None  # LazySMP helpers, set up by createBot
+        self.statsLog = None  # path, see createBot
+        self.lastStats = None  # searchStats() of the last getMove, also on the returned move
+        self.resetStats()
+
+    def resetStats(self):
+        # nodes counts quiescence nodes too, evalTime includes nnTime
+        self.nodes = 0
+        self.qnodes = 0
+        self.cutoffs = 0
+        self.firstMoveCutoffs = 0
+        self.evalTime = 0.0
+        self.nnTime = 0.0  # network forward passes, kept up to date by the evaluator
+        self.orderer.movegenTime = 0.0
+        self.iterations = []  # (depth, seconds, nodes) of each completed iteration
+        self.ttProbes = self.tt.probes if self.tt is not None else 0
+        self.ttHits = self.tt.hits if self.tt is not None else 0
+
+    def searchStats(self, elapsed):
+        # what the last search did, JSON-friendly
+        tt = self.tt
+        probes = tt.probes - self.ttProbes if tt is not None else 0
+        ebf = None
+        if len(self.iterations) > 1 and self.iterations[-2][2]:
+            ebf = self.iterations[-1][2] / self.iterations[-2][2]
+        return {
+            'depth':               self.completedDepth,
+            'score':               self.lastScore,
+            'nodes':               self.nodes,
+            'qnodes':              self.qnodes,
+            'time':                elapsed,
+            'nps':                 self.nodes / elapsed if elapsed else 0.0,
+            'ebf':                 ebf,  # nodes of the last iteration over the one before
+            'firstMoveCutoffRate': self.firstMoveCutoffs / self.cutoffs if self.cutoffs else 0.0,
+            'ttHitRate':           (tt.hits - self.ttHits) / probes if probes else 0.0,
+            'depthTimes':          [list(iteration) for iteration in self.iterations],
+            'movegenTime':         self.orderer.movegenTime,
+            'evalTime':            self.evalTime,
+            'nnTime':              self.nnTime,
+        }
+
+    def logStats(self, gs, move, stats):
+        with open(self.statsLog, 'a') as f:
+            f.write(json.dumps(dict(stats, fen=gs.getFen(), move=move.code if move else None)) + '\n')
+
+    def search(self, gs, depth, alpha, beta, allowNull=True):
+        # scores are for the side to move
+        self.nodes += 1
+        if time.perf_counter() > self.deadline:
+            raise SearchTimeout
+        if self.stopEvent is not None and self.nodes & 63 == 0 and self.stopEvent.is_set():
+            raise SearchTimeout
+        if depth <= 0:
+            return self.quiesce(gs, alpha, beta)
+
+        ply = len(gs.undoStack) - self.rootPly
+        tt = self.tt
+        key = gs.zobristKey
+        alphaOrig = alpha
+        ttMove = None
+        if tt is not None:
+            entry = tt.probe(key)
+            if entry is not None:
+                ttMove = entry[3]
+                if ply > 0:  # the root always searches, it has to return a move
+                    ttScore, alpha, beta = ttBound(entry, depth, alpha, beta, ply)
+                    if ttScore is not None:
+                        tt.cutoffs += 1
+                        return ttScore
+
+        inCheck = gs.sideToMoveInCheck()
+        pvNode = beta - alpha > 1
+        # null move - if passing still fails high, a real move would too. Not in check
+        # (passing is illegal) and not with only pawns left (zugzwang is common)
+        if allowNull and not pvNode and not inCheck and depth >= NULL_MIN_DEPTH and ply > 0 \
+                and hasPieces(gs, 'w' if gs.whiteToMove else 'b'):
+            gs.pushNullMove()
+            score = -self.search(gs, depth - 1 - NULL_REDUCTION, -beta, -beta + 1, False)
+            gs.popNullMove()
+            if score >= beta:
+                return beta
+
+        best = -float('inf')
         bestMove = None
-        if maximizing:
-            maxEval = -float('inf')
-            for move in moves:
-                gs.makeMove(move)
-                if move.promotionPending:
-                    gs.board[move.endRow][move.endCol] = 'wQ'
-                    move.promotionPiece = 'wQ'
-                eval, _ = self.minimax(gs, depth - 1, alpha, beta, False)
-                gs.undoMove()
-                # restore flags after undo
-                (gs.whiteKingMoved, gs.blackKingMoved,
-                 gs.whiteKingsRookMoved, gs.whiteQueensRookMoved,
-                 gs.blackKingsRookMoved, gs.blackQueensRookMoved,
-                 gs.enPassantTarget) = savedFlags
-                if eval > maxEval:
-                    maxEval = eval
-                    bestMove = move
-                alpha = max(alpha, eval)
-                if beta <= alpha:
-                    break
-            return maxEval, bestMove
+        moveCount = 0
+        moves = self.orderer.orderedMoves(gs, ply, ttMove)
+        batch = depth == 1 and self.batchLeaves
+        if batch:
+            moves = list(moves)
+        for move in moves:
+            gs.pushMove(move)
+            if moveCount == 0:
+                score = -self.search(gs, depth - 1, -beta, -alpha)
+            else:
+                # late quiet moves are rarely best, search them shallower first
+                reduction = 0
+                if depth >= LMR_MIN_DEPTH and moveCount >= LMR_MIN_MOVES and not inCheck \
+                        and not move & TACTICAL and not gs.sideToMoveInCheck():
+                    reduction = 1 if moveCount < LMR_MIN_MOVES * 2 else 2
+                # PVS - prove the move is worse with a null window, re-search if it isn't
+                score = -self.search(gs, depth - 1 - reduction, -alpha - 1, -alpha)
+                if score > alpha and reduction:
+                    score = -self.search(gs, depth - 1, -alpha - 1, -alpha)
+                if alpha < score < beta:
+                    score = -self.search(gs, depth - 1, -beta, -alpha)
+            gs.popMove()
+            moveCount += 1
+            if score > best:
+                best, bestMove = score, move
+                if ply == 0:
+                    self.rootMove = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        self.orderer.addCutoff(move, ply, depth)
+                        self.cutoffs += 1
+                        if moveCount == 1:
+                            self.firstMoveCutoffs += 1
+                        break
+            if batch and moveCount == 1:
+                # the first move didn't cut off, so every child gets searched -
+                # let the evaluator score the remaining leaves together
+                t = time.perf_counter()
+                self.prefetch(gs, moves[1:])
+                self.evalTime += time.perf_counter() - t
+
+        if bestMove is None:  # no legal moves, sooner mates score higher
+            return -MATE_SCORE + ply if inCheck else 0
+        if tt is not None:
+            ttStore(tt, key, depth, best, bestMove, alphaOrig, beta, ply)
+        return best
+
+    def prefetch(self, gs, moves):
+        # hook for evaluators that score many positions at once, see HardBot
+        pass
+
+    # captures and promotions only, until the position is quiet, so the search never
+    # stops in the middle of an exchange
+    def quiesce(self, gs, alpha, beta):
+        self.nodes += 1
+        self.qnodes += 1
+        if time.perf_counter() > self.deadline:
+            raise SearchTimeout
+        if self.stopEvent is not None and self.nodes & 63 == 0 and self.stopEvent.is_set():
+            raise SearchTimeout
+
+        inCheck = gs.sideToMoveInCheck()
+        t = time.perf_counter()
+        moves = gs.getLegalMoves(capturesOnly=True)  # every evasion when in check
+        now = time.perf_counter()
+        self.orderer.movegenTime += now - t
+        if not moves and inCheck:
+            return -MATE_SCORE + len(gs.undoStack) - self.rootPly
+        standPat = None
+        if not inCheck:
+            # stand pat - the side to move doesn't have to capture
+            standPat = self.evaluateBoard(gs) if gs.whiteToMove else -self.evaluateBoard(gs)
+            self.evalTime += time.perf_counter() - now
+            if standPat >= beta:
+                return standPat
+            alpha = max(alpha, standPat)
+
+        best = standPat if standPat is not None else -MATE_SCORE
+        moves = sortCaptures(gs.board, moves)
+        for move in moves:
+            # delta pruning - even winning the piece for free can't raise alpha
+            if standPat is not None and self.deltaMargin is not None and \
+                    standPat + captureGain(gs, move) + self.deltaMargin <= alpha:
+                continue
+            gs.pushMove(move)
+            score = -self.quiesce(gs, -beta, -alpha)
+            gs.popMove()
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best
+
+    def searchRoot(self, gs, depth, prevScore):
+        # aspiration window around the last iteration's score, widened on a fail
+        if depth < ASPIRATION_MIN_DEPTH or abs(prevScore) >= MATE_SCORE - MAX_PLY:
+            return self.search(gs, depth, -float('inf'), float('inf'))
+        window = self.aspirationWindow
+        alpha, beta = prevScore - window, prevScore + window
+        while True:
+            score = self.search(gs, depth, alpha, beta)
+            if alpha < score < beta:
+                return score
+            window *= 4
+            if window > self.aspirationWindow * 64:
+                return self.search(gs, depth, -float('inf'), float('inf'))
+            if score <= alpha:
+                alpha = prevScore - window
+            else:
+                beta = prevScore + window
+
+    def getMove(self, gs, timeLeft=None, increment=0):
+        # timeLeft/increment in seconds, without them search self.depth plies
+        start = time.perf_counter()
+        if timeLeft is None:
+            soft, hard = float('inf'), float('inf')
+            maxDepth = self.depth
         else:
-            minEval = float('inf')
-            for move in moves:
-                gs.makeMove(move)
-                if move.promotionPending:
-                    gs.board[move.endRow][move.endCol] = 'bQ'
-                    move.promotionPiece = 'bQ'
-                eval, _ = self.minimax(gs, depth - 1, alpha, beta, True)
-                gs.undoMove()
-                # restore flags after undo
-                (gs.whiteKingMoved, gs.blackKingMoved,
-                 gs.whiteKingsRookMoved, gs.whiteQueensRookMoved,
-                 gs.blackKingsRookMoved, gs.blackQueensRookMoved,
-                 gs.enPassantTarget) = savedFlags
-                if eval < minEval:
-                    minEval = eval
-                    bestMove = move
-                beta = min(beta, eval)
-                if beta <= alpha:
-                    break
-            return minEval, bestMove
-
-    def getMove(self, gs):
-        maximizing = gs.whiteToMove
-        _, move = self.minimax(gs, self.depth, -float('inf'), float('inf'), maximizing)
+            soft, hard = allocateTime(timeLeft, increment)
+            maxDepth = self.maxDepth
+        self.deadline = start + hard
+        self.completedDepth = 0
+        if self.tt is not None:
+            self.tt.newSearch()
+        self.orderer.newSearch()
+        self.resetStats()
+        if self.smp is not None:
+            self.smp.start(gs)
+
+        self.rootPly = len(gs.undoStack)
+        bestMove = None
+        score = 0
+        for depth in range(1, maxDepth + 1):
+            self.rootMove = None
+            iterationStart, iterationNodes = time.perf_counter(), self.nodes
+            try:
+                score = self.searchRoot(gs, depth, score)
+            except SearchTimeout:
+                # out of time or stopped, unwind the moves the aborted iteration left on the board
+                gs.unwindTo(self.rootPly)
+                break
+            if self.rootMove is None:  # checkmate or stalemate on the board
+                break
+            bestMove, self.lastScore, self.completedDepth = self.rootMove, score, depth
+            self.iterations.append((depth, time.perf_counter() - iterationStart, self.nodes - iterationNodes))
+            # a mate this iteration searched all the way to is final, one seen through the
+            # table at a shallower depth still has to be confirmed
+            if abs(score) >= MATE_SCORE - MAX_PLY and depth >= MATE_SCORE - abs(score):
+                break
+            # the next iteration takes several times longer, don't start what can't finish
+            if time.perf_counter() - start > soft * 0.5:
+                break
+        if self.smp is not None:
+            self.smp.stop()
+
+        move = None
+        if bestMove is None:
+            moves = gs.getLegalMoves()
+            if moves:
+                bestMove = sortCaptures(gs.board, moves)[0]
+        if bestMove is not None:
+            move = Move(bestMove, gs.board)
+        self.lastStats = self.searchStats(time.perf_counter() - start)
+        if move is not None:
+            move.stats = self.lastStats
+        if self.statsLog:
+            self.logStats(gs, move, self.lastStats)
         return move
-    
-MODEL_PATH = os.path.join(os.path.dirname(__file__), 'modelTraining', 'chess_model_hard.pth')
-
-class ChessNet(nn.Module):
-    def __init__(self):
-        super().__init__()
-        self.conv = nn.Sequential(
-            nn.Conv2d(12, 32, 3, padding=1), nn.BatchNorm2d(32), nn.ReLU(),
-            nn.Conv2d(32, 64, 3, padding=1), nn.BatchNorm2d(64), nn.ReLU(),
-            nn.Conv2d(64, 64, 3, padding=1), nn.BatchNorm2d(64), nn.ReLU(),
-        )
-        self.fc = nn.Sequential(
-            nn.Flatten(),
-            nn.Linear(64*8*8, 256), nn.ReLU(), nn.Dropout(0.3),
-            nn.Linear(256, 64),     nn.ReLU(),
-            nn.Linear(64, 1),       nn.Tanh()
-        )
-    def forward(self, x):
-        return self.fc(self.conv(x)).squeeze(1)
-
-def boardToTensor(board):
-    planes = np.zeros((12, 8, 8), dtype=np.float32)
-    piece_idx = {'P':0,'N':1,'B':2,'R':3,'Q':4,'K':5}
-    for sq in chess.SQUARES:
-        piece = board.piece_at(sq)
-        if piece:
-            row = 7 - (sq // 8)
-            col = sq % 8
-            idx = piece_idx[piece.symbol().upper()]
-            if piece.color == chess.WHITE:
-                planes[idx][row][col] = 1.0
-            else:
-                planes[idx+6][row][col] = 1.0
-    return planes
-
-class HardBot:
-    def __init__(self, playAsWhite):
-        self.playAsWhite = playAsWhite
-        self.depth = 4
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        self.model = ChessNet().to(self.device)
-        self.model.load_state_dict(torch.load(MODEL_PATH, map_location=self.device))
-        self.model.eval()
-
-    def gsToCBoard(self, gs):
-        board = chess.Board()
-        board.clear()
-        piece_map = {'P': chess.PAWN,   'N': chess.KNIGHT, 'B': chess.BISHOP,
-                     'R': chess.ROOK,   'Q': chess.QUEEN,  'K': chess.KING}
-        for r in range(8):
-            for c in range(8):
-                p = gs.board[r][c]
-                if p != '--':
-                    sq    = chess.square(c, 7 - r)
-                    color = chess.WHITE if p[0] == 'w' else chess.BLACK
-                    board.set_piece_at(sq, chess.Piece(piece_map[p[1]], color))
-        board.turn = chess.WHITE if gs.whiteToMove else chess.BLACK
-        return board
 
+    def helpSearch(self, gs, startDepth):
+        # Lazy SMP helper: the same iterative deepening with no clock, only to fill the
+        # shared table - runs until stopEvent is set or maxDepth is done
+        self.deadline = float('inf')
+        self.orderer.newSearch()
+        self.resetStats()
+        self.rootPly = len(gs.undoStack)
+        score = 0
+        for depth in range(startDepth, self.maxDepth + 1):
+            try:
+                score = self.searchRoot(gs, depth, score)
+            except SearchTimeout:
+                gs.unwindTo(self.rootPly)
+                break
+
+    def close(self):
+        if self.smp is not None:
+            self.smp.close()
+            self.smp = None
+
+class MediumBot(SearchBot):
+    def __init__(self, playAsWhite, ttSizeMB=16, maxDepth=MAX_DEPTH):
+        super().__init__(playAsWhite, 3, ttSizeMB, maxDepth)
+    
     def evaluateBoard(self, gs):
-        board  = self.gsToCBoard(gs)
-        tensor = torch.tensor(boardToTensor(board)).unsqueeze(0).to(self.device)
-        with torch.no_grad():
-            score = self.model(tensor).item()
-        return int(score * 10000)
-
-    def orderMoves(self, moves):
-        def score(move):
-            s = 0
-            if move.pieceCaptured != '--':
-                s += 10 * PIECE_VALUES.get(move.pieceCaptured[1], 0) \
-                        -      PIECE_VALUES.get(move.pieceMoved[1], 0)
-            if move.promotionPending:
-                s += 900
-            return s
-        return sorted(moves, key=score, reverse=True)
-
-    def minimax(self, gs, depth, alpha, beta, maximizing):
-        if depth == 0:
-            return self.evaluateBoard(gs), None
-
-        savedFlags = (gs.whiteKingMoved, gs.blackKingMoved,
-                      gs.whiteKingsRookMoved, gs.whiteQueensRookMoved,
-                      gs.blackKingsRookMoved, gs.blackQueensRookMoved,
-                      gs.enPassantTarget)
-
-        moves = self.orderMoves(gs.getValidMoves())
-        if not moves:
-            if gs.checkmate:
-                return (-99999 if maximizing else 99999), None
-            return 0, None
-
-        bestMove = None
-        if maximizing:
-            maxEval = -float('inf')
-            for move in moves:
-                gs.makeMove(move)
-                if move.promotionPending:
-                    gs.board[move.endRow][move.endCol] = 'wQ'
-                    move.promotionPiece = 'wQ'
-                eval, _ = self.minimax(gs, depth-1, alpha, beta, False)
-                gs.undoMove()
-                (gs.whiteKingMoved, gs.blackKingMoved,
-                 gs.whiteKingsRookMoved, gs.whiteQueensRookMoved,
-                 gs.blackKingsRookMoved, gs.blackQueensRookMoved,
-                 gs.enPassantTarget) = savedFlags
-                if eval > maxEval:
-                    maxEval, bestMove = eval, move
-                alpha = max(alpha, eval)
-                if beta <= alpha:
-                    break
-            return maxEval, bestMove
-        else:
-            minEval = float('inf')
-            for move in moves:
-                gs.makeMove(move)
-                if move.promotionPending:
-                    gs.board[move.endRow][move.endCol] = 'bQ'
-                    move.promotionPiece = 'bQ'
-                eval, _ = self.minimax(gs, depth-1, alpha, beta, True)
-                gs.undoMove()
-                (gs.whiteKingMoved, gs.blackKingMoved,
-                 gs.whiteKingsRookMoved, gs.whiteQueensRookMoved,
-                 gs.blackKingsRookMoved, gs.blackQueensRookMoved,
-                 gs.enPassantTarget) = savedFlags
-                if eval < minEval:
-                    minEval, bestMove = eval, move
-                beta = min(beta, eval)
-                if beta <= alpha:
-                    break
-            return minEval, bestMove
-
-    def getMove(self, gs):
-        maximizing = gs.whiteToMove
-        _, move = self.minimax(gs, self.depth, -float('inf'), float('inf'), maximizing)
-        return move
\ No newline at end of file
+        # material + piece-square score, kept up to date by the engine as moves are made
+        return gs.evaluate()
@@ -0,0 +1,121 @@
+# Runs a bot's search in its own process so the pygame loop keeps drawing at full fps.
+# The worker replays the game on its own engine, and the chosen move comes back
+# as a BOT_MOVE_EVENT on the pygame event queue.
+# preload() starts a worker before the game does, so torch is already imported when a Hard game begins.
+import multiprocessing as mp
+import threading
+import pygame as p # type: ignore
+import engine
+import profiler
+from bot import createBot
+
+BOT_MOVE_EVENT = p.event.custom_type()  # attributes: requestId, code (None if no move), stats (None from Easy)
+
+def _workerLoop(preloadHard, requests, results, stopEvent):
+    if preloadHard:
+        import hardBot  # noqa: F401 - the slow torch import, done while the menu is open
+    # the first request says which bot to play with, None if the worker isn't needed after all
+    config = requests.get()
+    if config is None:
+        return
+    mode, playAsWhite, options = config
+    # the bot lives for the whole game, so its transposition table carries over between moves
+    bot = createBot(mode, playAsWhite, **options)
+    if hasattr(bot, 'stopEvent'):
+        bot.stopEvent = stopEvent
+    while True:
+        request = requests.get()
+        if request is None:
+            if hasattr(bot, 'close'):
+                bot.close()  # e.g. HardBot saving its evaluation cache
+            if profiler.enabled():
+                profiler.report("engine profile, bot worker")  # atexit handlers don't run in a child process
+            break
+        requestId, fen, codes, timeLeft, increment = request
+        gs = engine.ChessEngine(fen, validate=False)  # checked when the game's engine loaded it
+        for code in codes:
+            gs.pushMove(code)
+        move = None
+        if not stopEvent.is_set():
+            move = bot.getMove(gs, timeLeft, increment)
+        results.put((requestId, move.code if move else None, move.stats if move else None))
+
+def _spawn(preloadHard, daemon=True):
+    # spawn - a forked copy of the pygame/torch state isn't safe to use
+    ctx = mp.get_context('spawn')
+    requests, results, stopEvent = ctx.Queue(), ctx.Queue(), ctx.Event()
+    process = ctx.Process(target=_workerLoop, daemon=daemon, args=(preloadHard, requests, results, stopEvent))
+    process.start()
+    return process, requests, results, stopEvent
+
+_standby = None  # a preloaded worker waiting for its game
+
+def preload():
+    # call once Hard is picked in the menu, BotWorker('hard', ...) then takes over this process
+    global _standby
+    if _standby is None:
+        _standby = _spawn(True)
+
+def discardPreload():
+    global _standby
+    if _standby is not None:
+        _standby[1].put(None)
+        _standby = None
+
+class BotWorker:
+    def __init__(self, mode, playAsWhite, **options):
+        global _standby
+        self.playAsWhite = playAsWhite
+        # daemonic processes can't start the Lazy SMP helpers
+        parallel = options.get('workers', 1) > 1
+        if mode == 'hard' and _standby is not None and not parallel:
+            worker, _standby = _standby, None
+        else:
+            discardPreload()  # torch would only cost memory in an Easy or Medium game
+            worker = _spawn(False, daemon=not parallel)
+        self.process, self.requests, self.results, self.stopEvent = worker
+        self.requests.put((mode, playAsWhite, options))
+        self.listener = threading.Thread(target=self._listen, daemon=True)
+        self.listener.start()
+        self.requestId = 0
+        self.pending = None  # id of the search in progress
+
+    def _listen(self):
+        while True:
+            result = self.results.get()
+            if result is None:
+                break
+            requestId, code, stats = result
+            p.event.post(p.event.Event(BOT_MOVE_EVENT, requestId=requestId, code=code, stats=stats))
+
+    def start(self, gs, timeLeft=None, increment=0):
+        # starts a search of the current position, returns its request id
+        self.requestId += 1
+        self.pending = self.requestId
+        self.stopEvent.clear()
+        codes = [move.code for move in gs.moveLog]
+        self.requests.put((self.requestId, gs.startFen, codes, timeLeft, increment))
+        return self.requestId
+
+    def thinking(self):
+        return self.pending is not None
+
+    def accept(self, event):
+        # True if the event is the answer to the search in progress, not a cancelled one
+        if event.requestId != self.pending:
+            return False
+        self.pending = None
+        return True
+
+    def cancel(self):
+        # the worker aborts, its answer is ignored by accept
+        self.pending = None
+        self.stopEvent.set()
+
+    def close(self):
+        self.cancel()
+        self.requests.put(None)
+        self.results.put(None)
+        self.process.join(timeout=3)
+        if self.process.is_alive():
+            self.process.terminate()
@@ -0,0 +1,35 @@
+# Network input planes straight from ChessEngine bitboards.
+# Same layout as modelTraining/prepareData.boardToTensor: planes 0-5 white P N B R Q K,
+# 6-11 black, planes[i][row][col] with row 0 = rank 8 - which is the engine's own
+# square order, so plane i is just the bits of pieceBB[PIECES[i]].
+import numpy as np # type: ignore
+from engine import PIECES
+
+def bitboards(gs):
+    # the 12 piece bitboards in plane order, cheap to collect while searching
+    return [gs.pieceBB[piece] for piece in PIECES]
+
+class PlaneEncoder:
+    # encodes into one preallocated buffer, the returned array is only valid until the next call
+    def __init__(self, capacity=1):
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self.buffer = np.zeros((capacity, 12, 8, 8), dtype=np.float32)
+        self._bitboards = np.zeros((capacity, 12), dtype='<u8')  # little endian, bit 0 first
+
+    def encodeMany(self, rows):
+        # rows - bitboards() of each position, returns float32 planes (len(rows), 12, 8, 8)
+        n = len(rows)
+        if n > self.capacity:
+            self._allocate(n)
+        bbs = self._bitboards[:n]
+        bbs[:] = rows
+        bits = np.unpackbits(bbs.view(np.uint8), bitorder='little')
+        out = self.buffer[:n]
+        out.reshape(-1)[:] = bits
+        return out
+
+    def encode(self, gs):
+        return self.encodeMany([bitboards(gs)])
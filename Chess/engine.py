@@ -1,289 +1,630 @@
 # Stores informations about current state of the game. 
 # Shows valid moves. Keeps move logs.
-from move import Move
+import os
+import random
+from move import (Move, FLAG_DOUBLE_PUSH, FLAG_KING_CASTLE, FLAG_QUEEN_CASTLE,
+                  FLAG_CAPTURE, FLAG_EN_PASSANT, FLAG_PROMOTION, PROMOTION_PIECES)
+from evaluation import PST_MG, PST_EG, PHASE, MAX_PHASE
+from bitboard import (FULL, SQUARE_BB, KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, BETWEEN,
+                      rookAttacks, bishopAttacks, queenAttacks, iterSquares)
+
+PIECES = ['wP', 'wN', 'wB', 'wR', 'wQ', 'wK', 'bP', 'bN', 'bB', 'bR', 'bQ', 'bK']
+
+# castling rights bits
+CASTLE_WK = 1
+CASTLE_WQ = 2
+CASTLE_BK = 4
+CASTLE_BQ = 8
+# rights that survive a move touching the square (king or rook moves away, rook gets captured)
+CASTLE_MASK = [15] * 64
+CASTLE_MASK[0]  = 15 & ~CASTLE_BQ   # a8
+CASTLE_MASK[4]  = 15 & ~(CASTLE_BK | CASTLE_BQ)  # e8
+CASTLE_MASK[7]  = 15 & ~CASTLE_BK   # h8
+CASTLE_MASK[56] = 15 & ~CASTLE_WQ   # a1
+CASTLE_MASK[60] = 15 & ~(CASTLE_WK | CASTLE_WQ)  # e1
+CASTLE_MASK[63] = 15 & ~CASTLE_WK   # h1
+
+# zobrist keys - fixed seed so hashes stay the same between runs
+_rng = random.Random(20240601)
+ZOBRIST_PIECE  = {piece: [_rng.getrandbits(64) for _ in range(64)] for piece in PIECES}
+ZOBRIST_SIDE   = _rng.getrandbits(64)  # black to move
+ZOBRIST_CASTLE = [_rng.getrandbits(64) for _ in range(16)]
+ZOBRIST_EP     = [_rng.getrandbits(64) for _ in range(8)]  # by file
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+FEN_PIECES = {'P': 'wP', 'N': 'wN', 'B': 'wB', 'R': 'wR', 'Q': 'wQ', 'K': 'wK',
+              'p': 'bP', 'n': 'bN', 'b': 'bB', 'r': 'bR', 'q': 'bQ', 'k': 'bK'}
+FEN_SYMBOLS = {piece: symbol for symbol, piece in FEN_PIECES.items()}
+FEN_CASTLING = (('K', CASTLE_WK), ('Q', CASTLE_WQ), ('k', CASTLE_BK), ('q', CASTLE_BQ))
+# king and rook a castling right needs, (row, col)
+CASTLING_SQUARES = {CASTLE_WK: ('wK', (7, 4), 'wR', (7, 7)), CASTLE_WQ: ('wK', (7, 4), 'wR', (7, 0)),
+                    CASTLE_BK: ('bK', (0, 4), 'bR', (0, 7)), CASTLE_BQ: ('bK', (0, 4), 'bR', (0, 0))}
 
 class ChessEngine:
-    def __init__(self):
-        self.board = [
-            ['bR', 'bN', 'bB', 'bQ', 'bK', 'bB', 'bN', 'bR'],
-             ['bP', 'bP', 'bP', 'bP', 'bP', 'bP', 'bP', 'bP'],
-             ['--', '--','--', '--','--', '--','--', '--'],
-             ['--', '--','--', '--','--', '--','--', '--'],
-             ['--', '--','--', '--','--', '--','--', '--'],
-             ['--', '--','--', '--','--', '--','--', '--'],
-             ['wP', 'wP', 'wP', 'wP', 'wP', 'wP', 'wP', 'wP'],
-             ['wR', 'wN', 'wB', 'wQ', 'wK', 'wB', 'wN', 'wR']
-        ]
-        self.whiteToMove = True
+    def __init__(self, fen=None, validate=True):
+        # fen - start somewhere other than the initial position, see loadFen
         self.moveLog = []
-        self.whiteKingMoved = False
-        self.blackKingMoved = False
-        self.whiteKingsRookMoved = False
-        self.whiteQueensRookMoved = False
-        self.blackKingsRookMoved = False
-        self.blackQueensRookMoved = False
+        # one entry per move made: the move code plus state it can't rebuild on its own
+        self.undoStack = []
+        # network input kept up to date by _putPiece/_removePiece, set by the NNUE bot
+        self.accumulator = None
+        # checked in place, a new engine has nothing to lose when the FEN is rejected
+        self._setPosition(fen if fen is not None else START_FEN, validate and fen is not None)
+
+    # FEN - validate=False is the fast path for positions already known to be good,
+    # e.g. bulk loads from a generated set or a position handed to a worker process
+    def loadFen(self, fen, validate=True):
+        if validate:
+            # checked on a scratch engine first, so a rejected FEN leaves this game as it was
+            ChessEngine(fen)
+        self._setPosition(fen, False)
+
+    def _setPosition(self, fen, validate):
+        fields = fen.split()
+        if validate:
+            self._checkFenFields(fields)
+        board = []
+        placed = []  # (piece, square), so initBitboards doesn't scan the empty squares
+        sq = 0
+        for rank in fields[0].split('/'):
+            row = []
+            for ch in rank:
+                if ch in '12345678':
+                    row += ['--'] * int(ch)
+                    sq += int(ch)
+                else:
+                    piece = FEN_PIECES[ch]
+                    row.append(piece)
+                    placed.append((piece, sq))
+                    sq += 1
+            board.append(row)
+        self.board = board
+        self.startBoard = [row[:] for row in board]  # for getBoardAtMove
+        self.whiteToMove = fields[1] == 'w'
+        self.castlingRights = 0
+        for symbol, bit in FEN_CASTLING:
+            if symbol in fields[2]:
+                self.castlingRights |= bit
         self.enPassantTarget = None
-        self.whiteKingPos = (7,4)
-        self.blackKingPos = (0,4)
-        self.checkingAttack = False
+        if fields[3] != '-':
+            self.enPassantTarget = (8 - int(fields[3][1]), ord(fields[3][0]) - ord('a'))
+        self.halfmoveClock = int(fields[4]) if len(fields) > 4 else 0  # plies since the last capture or pawn move
+        self.fullmoveStart = int(fields[5]) if len(fields) > 5 else 1
+        self.startWhiteToMove = self.whiteToMove
+        self.startFen = fen
+        self.moveLog.clear()
+        self.undoStack.clear()
         self.checkmate = False
         self.stalemate = False
-        self.positionHistory = {}
+        self.initBitboards(placed)
+        self.whiteKingPos = divmod(self.pieceBB['wK'].bit_length() - 1, 8)
+        self.blackKingPos = divmod(self.pieceBB['bK'].bit_length() - 1, 8)
+        if self.enPassantTarget is not None:
+            # like pushMove, only kept when a pawn can take - positions that play the same hash the same
+            r, c = self.enPassantTarget
+            pawn = 'wP' if self.whiteToMove else 'bP'
+            if not PAWN_ATTACKS['b' if self.whiteToMove else 'w'][r*8 + c] & self.pieceBB[pawn]:
+                self.enPassantTarget = None
+                self.zobristKey = self.computeHash()
+        self.hashHistory = [self.zobristKey]  # one key per position reached
+        if validate:
+            self._checkFenPosition(fen)
+
+    def _checkFenFields(self, fields):
+        fen = ' '.join(fields)
+        if not 4 <= len(fields) <= 6:
+            raise ValueError(f"invalid FEN {fen!r}: expected 4 to 6 fields")
+        ranks = fields[0].split('/')
+        if len(ranks) != 8:
+            raise ValueError(f"invalid FEN {fen!r}: expected 8 ranks")
+        for rank in ranks:
+            squares = 0
+            for ch in rank:
+                if ch in '12345678':
+                    squares += int(ch)
+                elif ch in FEN_PIECES:
+                    squares += 1
+                else:
+                    raise ValueError(f"invalid FEN {fen!r}: unknown piece {ch!r}")
+            if squares != 8:
+                raise ValueError(f"invalid FEN {fen!r}: rank {rank!r} isn't 8 squares")
+        if fields[1] not in ('w', 'b'):
+            raise ValueError(f"invalid FEN {fen!r}: side to move must be w or b")
+        if fields[2] != '-' and (not set(fields[2]) <= set('KQkq') or len(set(fields[2])) != len(fields[2])):
+            raise ValueError(f"invalid FEN {fen!r}: bad castling field {fields[2]!r}")
+        ep = fields[3]
+        if ep != '-' and (len(ep) != 2 or ep[0] not in 'abcdefgh' or ep[1] != ('6' if fields[1] == 'w' else '3')):
+            raise ValueError(f"invalid FEN {fen!r}: bad en passant square {ep!r}")
+        for clock in fields[4:]:
+            if not clock.isdigit():
+                raise ValueError(f"invalid FEN {fen!r}: move clocks must be numbers")
+
+    def _checkFenPosition(self, fen):
+        # what the fields alone can't show: kings, pawns, castling and en passant against the board
+        for king in ('wK', 'bK'):
+            if bin(self.pieceBB[king]).count('1') != 1:
+                raise ValueError(f"invalid FEN {fen!r}: needs exactly one {king}")
+        if any(piece[1] == 'P' for piece in self.board[0] + self.board[7]):
+            raise ValueError(f"invalid FEN {fen!r}: pawn on the first or last rank")
+        for symbol, bit in FEN_CASTLING:
+            king, kingSq, rook, rookSq = CASTLING_SQUARES[bit]
+            if self.castlingRights & bit and (self.board[kingSq[0]][kingSq[1]] != king or
+                                              self.board[rookSq[0]][rookSq[1]] != rook):
+                raise ValueError(f"invalid FEN {fen!r}: castling {symbol} without king and rook at home")
+        ep = fen.split()[3]
+        if ep != '-':
+            r, c = 8 - int(ep[1]), ord(ep[0]) - ord('a')
+            pawnRow = r + 1 if self.whiteToMove else r - 1
+            if self.board[r][c] != '--' or self.board[pawnRow][c] != ('b' if self.whiteToMove else 'w') + 'P':
+                raise ValueError(f"invalid FEN {fen!r}: no pawn that just moved past {ep}")
+        enemyKing = self.blackKingPos if self.whiteToMove else self.whiteKingPos
+        if self.isSquareAttacked(enemyKing[0], enemyKing[1], self.whiteToMove):
+            raise ValueError(f"invalid FEN {fen!r}: the side not to move is in check")
+
+    def getFen(self):
+        ranks = []
+        for row in self.board:
+            rank = ''
+            empty = 0
+            for piece in row:
+                if piece == '--':
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                rank += FEN_SYMBOLS[piece]
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+        castling = ''.join(symbol for symbol, bit in FEN_CASTLING if self.castlingRights & bit) or '-'
+        ep = '-'
+        if self.enPassantTarget is not None:
+            r, c = self.enPassantTarget
+            ep = 'abcdefgh'[c] + str(8 - r)
+        # one full move per white + black move, counted from the loaded position
+        plies = len(self.undoStack) + (0 if self.startWhiteToMove else 1)
+        fullmove = self.fullmoveStart + plies // 2
+        return f"{'/'.join(ranks)} {'w' if self.whiteToMove else 'b'} {castling} {ep} {self.halfmoveClock} {fullmove}"
 
+    # bitboards - one 64-bit int per piece plus occupancy masks
+    # self.board stays as the 8x8 view used by the UI and is kept in sync
+    def initBitboards(self, placed=None):
+        # placed - (piece, square) of every piece, read from self.board when not given
+        if placed is None:
+            placed = [(piece, sq) for sq, piece in enumerate(p for row in self.board for p in row) if piece != '--']
+        pieceBB = {piece: 0 for piece in PIECES}
+        colorBB = {'w': 0, 'b': 0}
+        # material + piece-square score for white, middlegame and endgame, see evaluate
+        mg = eg = phase = 0
+        key = 0
+        for piece, sq in placed:
+            bit = SQUARE_BB[sq]
+            pieceBB[piece] |= bit
+            colorBB[piece[0]] |= bit
+            mg += PST_MG[piece][sq]
+            eg += PST_EG[piece][sq]
+            phase += PHASE[piece]
+            key ^= ZOBRIST_PIECE[piece][sq]
+        self.pieceBB, self.colorBB = pieceBB, colorBB
+        self.mgScore, self.egScore, self.phase = mg, eg, phase
+        self.occupied = colorBB['w'] | colorBB['b']
+        if not self.whiteToMove:
+            key ^= ZOBRIST_SIDE
+        key ^= ZOBRIST_CASTLE[self.castlingRights]
+        if self.enPassantTarget is not None:
+            key ^= ZOBRIST_EP[self.enPassantTarget[1]]
+        self.zobristKey = key
+        if self.accumulator is not None:
+            self.accumulator.refresh(self)
+
+    def computeHash(self):
+        # full recompute, makeMove/undoMove keep zobristKey up to date incrementally
+        key = 0
+        for piece in PIECES:
+            for sq in iterSquares(self.pieceBB[piece]):
+                key ^= ZOBRIST_PIECE[piece][sq]
+        if not self.whiteToMove:
+            key ^= ZOBRIST_SIDE
+        key ^= ZOBRIST_CASTLE[self.castlingRights]
+        if self.enPassantTarget is not None:
+            key ^= ZOBRIST_EP[self.enPassantTarget[1]]
+        return key
+
+    def _putPiece(self, piece, r, c):
+        bit = SQUARE_BB[r*8 + c]
+        self.board[r][c] = piece
+        self.pieceBB[piece] |= bit
+        self.colorBB[piece[0]] |= bit
+        self.occupied |= bit
+        self.zobristKey ^= ZOBRIST_PIECE[piece][r*8 + c]
+        self.mgScore += PST_MG[piece][r*8 + c]
+        self.egScore += PST_EG[piece][r*8 + c]
+        self.phase += PHASE[piece]
+        if self.accumulator is not None:
+            self.accumulator.add(piece, r*8 + c)
+
+    def _removePiece(self, r, c):
+        piece = self.board[r][c]
+        if piece != '--':
+            bit = SQUARE_BB[r*8 + c]
+            self.board[r][c] = '--'
+            self.pieceBB[piece] ^= bit
+            self.colorBB[piece[0]] ^= bit
+            self.occupied ^= bit
+            self.zobristKey ^= ZOBRIST_PIECE[piece][r*8 + c]
+            self.mgScore -= PST_MG[piece][r*8 + c]
+            self.egScore -= PST_EG[piece][r*8 + c]
+            self.phase -= PHASE[piece]
+            if self.accumulator is not None:
+                self.accumulator.sub(piece, r*8 + c)
+        return piece
+
+    def evaluate(self):
+        # white's material + piece-square score, blended from middlegame to endgame
+        # as pieces come off (promotions can push phase past MAX_PHASE)
+        phase = min(self.phase, MAX_PHASE)
+        return (self.mgScore * phase + self.egScore * (MAX_PHASE - phase)) // MAX_PHASE
+
+    # game moves - Move wrappers, recorded in moveLog for the UI
     def makeMove(self, move):
-        self.board[move.startRow][move.startCol] = "--"
-        self.board[move.endRow][move.endCol] = move.pieceMoved
+        self.pushMove(move.code)
         self.moveLog.append(move)
+
+    def undoMove(self):
+        if len(self.moveLog) == 0:
+            return
+        self.moveLog.pop()
+        self.popMove()
+
+    # search moves - plain int codes, nothing allocated besides the undo entry
+    def pushMove(self, code):
+        startSq = code & 63
+        endSq = (code >> 6) & 63
+        flag = code >> 12
+        startRow, startCol = startSq >> 3, startSq & 7
+        endRow, endCol = endSq >> 3, endSq & 7
+        prevRights, prevEnPassant = self.castlingRights, self.enPassantTarget
+
+        if flag == FLAG_EN_PASSANT:
+            captured = self._removePiece(startRow, endCol)
+        else:
+            captured = self._removePiece(endRow, endCol)
+        piece = self._removePiece(startRow, startCol)
+        if flag & FLAG_PROMOTION:
+            self._putPiece(piece[0] + PROMOTION_PIECES[flag & 3], endRow, endCol)
+        else:
+            self._putPiece(piece, endRow, endCol)
+        self.undoStack.append((code, captured, prevRights, prevEnPassant, self.halfmoveClock))
         self.enPassantTarget = None
 
-        # update king rook moved flags, for castling
-        if move.pieceMoved == 'wK':
-            self.whiteKingMoved = True
-            self.whiteKingPos = (move.endRow, move.endCol)
-        elif move.pieceMoved == 'bK':
-            self.blackKingMoved = True
-            self.blackKingPos = (move.endRow, move.endCol)
-        elif move.pieceMoved == 'wR':
-            if move.startRow == 7 and move.startCol == 0:
-                self.whiteQueensRookMoved = True
-            elif move.startRow == 7 and move.startCol == 7:
-                self.whiteKingsRookMoved = True
-        elif move.pieceMoved == 'bR':
-            if move.startRow == 0 and move.startCol == 0:
-                self.blackQueensRookMoved = True
-            elif move.startRow == 0 and move.startCol == 7:
-                self.blackKingsRookMoved = True        
-
-        # handle castling
-        if move.pieceMoved[1] == 'K' and abs(move.endCol - move.startCol) == 2:
-            move.isCastle = True
-            if move.endCol == 6:  # kingside
-                rookStartCol = 7
-                rookEndCol = 5
-            else:  # queenside
-                rookStartCol = 0
-                rookEndCol = 3
-            self.board[move.endRow][rookEndCol] = self.board[move.endRow][rookStartCol]
-            self.board[move.endRow][rookStartCol] = "--"
-
-            # update rook flags
-            if self.whiteToMove:
-                if rookStartCol == 7:
-                    self.whiteKingsRookMoved = True
-                else:
-                    self.whiteQueensRookMoved = True
+        if piece[1] == 'K':
+            if piece[0] == 'w':
+                self.whiteKingPos = (endRow, endCol)
             else:
-                if rookStartCol == 7:
-                    self.blackKingsRookMoved = True
-                else:
-                    self.blackQueensRookMoved = True        
-        # pawn promotion
-        if move.pieceMoved[1] == "P" and (move.endRow == 0 or move.endRow == 7):
-            move.promotionPending = True
-        # en passant 
-        if move.pieceMoved[1] == "P" and abs(move.startRow - move.endRow) == 2:
-            midRow = (move.startRow + move.endRow) // 2
-            self.enPassantTarget = (midRow, move.startCol)
-        if move.enPassant:
-            self.board[move.startRow][move.endCol] = "--"
+                self.blackKingPos = (endRow, endCol)
+            # handle castling
+            if flag == FLAG_KING_CASTLE:
+                self._putPiece(self._removePiece(endRow, 7), endRow, 5)
+            elif flag == FLAG_QUEEN_CASTLE:
+                self._putPiece(self._removePiece(endRow, 0), endRow, 3)
+        # castling rights - king or rook leaving home, rook captured at home
+        self.castlingRights &= CASTLE_MASK[startSq] & CASTLE_MASK[endSq]
+
+        # en passant - only recorded when an enemy pawn can actually take, so it only
+        # splits the hash of positions that really differ
+        if flag == FLAG_DOUBLE_PUSH:
+            midSq = (startSq + endSq) >> 1
+            enemyPawns = self.pieceBB['bP' if piece[0] == 'w' else 'wP']
+            if PAWN_ATTACKS[piece[0]][midSq] & enemyPawns:
+                self.enPassantTarget = (midSq >> 3, startCol)
+
+        if piece[1] == 'P' or captured != '--':
+            self.halfmoveClock = 0
+        else:
+            self.halfmoveClock += 1
 
         self.whiteToMove = not self.whiteToMove
-        key = self._boardKey()
-        self.positionHistory[key] = self.positionHistory.get(key, 0) + 1
-
-    def getAllPossibleMoves(self):
-        moves = []
-        for r in range(8):
-            for c in range(8):
-                piece = self.board[r][c]
-                if piece != "--":
-                    if (self.whiteToMove and piece[0] == "w") or (not self.whiteToMove and piece[0] == "b"):
-                        if piece[1] == "P":  # pawns
-                            self.getPawnMoves(r, c, moves)
-                        elif piece[1] == "R":
-                            self.getRookMoves(r, c, moves)
-                        elif piece[1] == "B":
-                            self.getBishopMoves(r, c, moves)
-                        elif piece[1] == "N":
-                            self.getKnightMoves(r, c, moves)
-                        elif piece[1] == "Q":
-                            self.getQueenMoves(r, c, moves)
-                        elif piece[1] == "K":
-                            self.getKingMoves(r, c, moves)
-                        else:
-                            return 0
-        return moves # list of possible moves for current player
-    
-    def getPawnMoves(self, r, c, moves): # TBD EN PASSANT and promotion
-        if self.whiteToMove: # white pawn
-            # 1 square forward
-            if r-1 >= 0 and self.board[r-1][c] == "--":
-                moves.append(Move((r,c), (r-1, c), self.board))
-                # 2 squares forward from starting row
-                if r == 6 and self.board[r-2][c] == "--":
-                    moves.append(Move((r,c), (r-2, c), self.board))
-            
-            # captures, diagonally left
-            if c-1 >= 0 and r-1 >= 0:
-                if self.board[r-1][c-1] != "--" and self.board[r-1][c-1][0] == "b":
-                    moves.append(Move((r, c), (r-1, c-1), self.board))
-            # diagonally right
-            if c+1 <= 7 and r-1 >= 0:
-                if self.board[r-1][c+1] != "--" and self.board[r-1][c+1][0] == "b":
-                    moves.append(Move((r, c), (r-1, c+1), self.board))
-            if (r-1, c-1) == self.enPassantTarget:
-                moves.append(Move((r,c),(r-1,c-1), self.board, enPassant=True))
-            if (r-1, c+1) == self.enPassantTarget:
-                moves.append(Move((r,c),(r-1,c+1), self.board, enPassant=True))
-
-        else: # black pawn
-            # 1 square forward
-            if r+1 <= 7 and self.board[r+1][c] == "--":
-                moves.append(Move((r,c), (r+1,c), self.board))
-                # 2 squares forward
-                if r == 1 and self.board[r+2][c] == "--":
-                    moves.append(Move((r,c), (r+2,c), self.board))
-            
-            # captures, diagonally left
-            if c-1 >= 0 and r+1 <= 7:
-                if self.board[r+1][c-1] != "--" and self.board[r+1][c-1][0] == "w":
-                    moves.append(Move((r, c), (r+1, c-1), self.board))
-            # diagonally right
-            if c+1 <= 7 and r+1 <= 7:
-                if self.board[r+1][c+1] != "--" and self.board[r+1][c+1][0] == "w":
-                    moves.append(Move((r, c), (r+1, c+1), self.board))
-            if (r+1, c-1) == self.enPassantTarget:
-                moves.append(Move((r,c),(r+1,c-1), self.board, enPassant=True))
-            if (r+1, c+1) == self.enPassantTarget:
-                moves.append(Move((r,c),(r+1,c+1), self.board, enPassant=True))
-
-    def pieceMoves(self, directions, r, c, moves, slide=True):
-        # generate all possible moves from position (r,c) for current player
-        enemyColor = 'b' if self.whiteToMove else 'w'
-        for d in directions:
-            dr, dc = d
-            row, col = r+dr, c+dc
-            while 0 <= row <= 7 and 0 <= col <= 7:
-                square = self.board[row][col]
-                if square == "--":
-                    moves.append(Move((r, c), (row, col), self.board))
-                elif square[0] == enemyColor:
-                    moves.append(Move((r, c), (row, col), self.board))
-                    break
+        key = self.zobristKey ^ ZOBRIST_SIDE
+        if self.castlingRights != prevRights:
+            key ^= ZOBRIST_CASTLE[prevRights] ^ ZOBRIST_CASTLE[self.castlingRights]
+        if prevEnPassant is not None:
+            key ^= ZOBRIST_EP[prevEnPassant[1]]
+        if self.enPassantTarget is not None:
+            key ^= ZOBRIST_EP[self.enPassantTarget[1]]
+        self.zobristKey = key
+        self.hashHistory.append(key)
+
+    def popMove(self):
+        code, captured, self.castlingRights, self.enPassantTarget, self.halfmoveClock = self.undoStack.pop()
+        startSq = code & 63
+        endSq = (code >> 6) & 63
+        flag = code >> 12
+        startRow, startCol = startSq >> 3, startSq & 7
+        endRow, endCol = endSq >> 3, endSq & 7
+
+        piece = self._removePiece(endRow, endCol)  # moved or promoted piece
+        if flag & FLAG_PROMOTION:
+            piece = piece[0] + 'P'
+        self._putPiece(piece, startRow, startCol)
+        if captured != '--':
+            if flag == FLAG_EN_PASSANT:
+                self._putPiece(captured, startRow, endCol)  # restore captured pawn
+            else:
+                self._putPiece(captured, endRow, endCol)
+
+        self.whiteToMove = not self.whiteToMove
+
+        if piece[1] == 'K':
+            if piece[0] == 'w':
+                self.whiteKingPos = (startRow, startCol)
+            else:
+                self.blackKingPos = (startRow, startCol)
+            # undo castling
+            if flag == FLAG_KING_CASTLE:
+                self._putPiece(self._removePiece(endRow, 5), endRow, 7)
+            elif flag == FLAG_QUEEN_CASTLE:
+                self._putPiece(self._removePiece(endRow, 3), endRow, 0)
+
+        self.hashHistory.pop()
+        self.zobristKey = self.hashHistory[-1]
+        return code
+
+    # null move - the side to move passes, only used by the search's null-move pruning
+    def pushNullMove(self):
+        self.undoStack.append((None, '--', self.castlingRights, self.enPassantTarget, self.halfmoveClock))
+        key = self.zobristKey ^ ZOBRIST_SIDE
+        if self.enPassantTarget is not None:
+            key ^= ZOBRIST_EP[self.enPassantTarget[1]]
+        self.enPassantTarget = None
+        self.halfmoveClock += 1
+        self.whiteToMove = not self.whiteToMove
+        self.zobristKey = key
+        self.hashHistory.append(key)
+
+    def popNullMove(self):
+        _, _, self.castlingRights, self.enPassantTarget, self.halfmoveClock = self.undoStack.pop()
+        self.whiteToMove = not self.whiteToMove
+        self.hashHistory.pop()
+        self.zobristKey = self.hashHistory[-1]
+
+    def unwindTo(self, size):
+        # pops search moves (null moves too) until the undo stack is back to size
+        while len(self.undoStack) > size:
+            if self.undoStack[-1][0] is None:
+                self.popNullMove()
+            else:
+                self.popMove()
+
+    def _addMoves(self, fromSq, targets, enemy, moves):
+        # one code per set bit in targets, captures flagged
+        for toSq in iterSquares(targets & enemy):
+            moves.append(fromSq | (toSq << 6) | (FLAG_CAPTURE << 12))
+        for toSq in iterSquares(targets & ~enemy):
+            moves.append(fromSq | (toSq << 6))
+
+    # piece generators take an optional target mask (check evasions) and pin info,
+    # with the defaults they produce pseudo-legal moves
+    def getPawnMoves(self, color, moves, targetMask=FULL, pinned=0, pinRays=None, enPassant=True):
+        pawns = self.pieceBB[color + 'P']
+        if not pawns:
+            return
+        empty = ~self.occupied
+        if color == 'w':
+            enemy = self.colorBB['b']
+            forward, startRow = -8, 6
+        else:
+            enemy = self.colorBB['w']
+            forward, startRow = 8, 1
+        attacks = PAWN_ATTACKS[color]
+        lastRowBB = 0xFF if color == 'w' else 0xFF << 56
+        for sq in iterSquares(pawns):
+            allowed = targetMask
+            if pinned & SQUARE_BB[sq]:
+                allowed &= pinRays[sq]
+            # 1 square forward, 2 squares from starting row
+            oneSq = sq + forward
+            if SQUARE_BB[oneSq] & empty:
+                if SQUARE_BB[oneSq] & allowed:
+                    if SQUARE_BB[oneSq] & lastRowBB:
+                        self._addPromotions(sq, oneSq, 0, moves)
+                    else:
+                        moves.append(sq | (oneSq << 6))
+                twoSq = oneSq + forward
+                if sq >> 3 == startRow and SQUARE_BB[twoSq] & empty & allowed:
+                    moves.append(sq | (twoSq << 6) | (FLAG_DOUBLE_PUSH << 12))
+            # captures
+            for toSq in iterSquares(attacks[sq] & enemy & allowed):
+                if SQUARE_BB[toSq] & lastRowBB:
+                    self._addPromotions(sq, toSq, FLAG_CAPTURE, moves)
                 else:
-                    break
-                if not slide:
-                    break
-                row = dr + row
-                col = dc + col   
-    
-    def getRookMoves(self, r, c, moves):
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]  # up, down, left, right
-        self.pieceMoves(directions, r, c, moves)          
+                    moves.append(sq | (toSq << 6) | (FLAG_CAPTURE << 12))
+        if enPassant and self.enPassantTarget is not None:
+            epRow, epCol = self.enPassantTarget
+            epSq = epRow*8 + epCol
+            # pawns that attack the target are the squares an enemy pawn on the target would attack
+            enemyColor = 'b' if color == 'w' else 'w'
+            for sq in iterSquares(PAWN_ATTACKS[enemyColor][epSq] & pawns):
+                if pinRays is None or self._enPassantIsLegal(color, sq, epSq):
+                    moves.append(sq | (epSq << 6) | (FLAG_EN_PASSANT << 12))
 
-    def getBishopMoves(self, r, c, moves):
-        directions = [(-1,-1), (-1,1), (1,-1), (1,1)]  # up-left, up-right, down-left, down-right
-        self.pieceMoves(directions, r, c, moves)
-    
-    def getQueenMoves(self, r, c, moves):
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1), 
-                      (-1,-1), (-1,1), (1,-1), (1,1)]
-        self.pieceMoves(directions, r, c, moves)
-    
-    def getKnightMoves(self, r, c, moves):
-        directions = [(-2,-1), (-2,1), (-1,-2), (-1,2),
-                        (1,-2),  (1,2),  (2,-1),  (2,1)]
-        self.pieceMoves(directions, r, c, moves, slide=False) 
-        # knights jump directly to squares, only one possible square per move direction - doesn't need the loop
-    
-    def getKingMoves(self, r, c, moves):
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1),  # straight
-              (-1, -1), (-1, 1), (1, -1), (1, 1)] # diagonal
-        self.pieceMoves(directions, r, c, moves, slide=False) 
-        if not self.checkingAttack:    
-            self.getCastleMoves(r, c, moves)
+    def _addPromotions(self, fromSq, toSq, captureFlag, moves):
+        # queen first, it's nearly always the one wanted
+        base = fromSq | (toSq << 6)
+        for i in (3, 0, 1, 2):
+            moves.append(base | ((FLAG_PROMOTION | captureFlag | i) << 12))
+
+    def _enPassantIsLegal(self, color, fromSq, epSq):
+        # two pieces leave the board line at once, so test the resulting occupancy directly
+        capturedSq = fromSq - fromSq % 8 + epSq % 8
+        occ = (self.occupied ^ SQUARE_BB[fromSq] ^ SQUARE_BB[capturedSq]) | SQUARE_BB[epSq]
+        enemyColor = 'b' if color == 'w' else 'w'
+        kingSq = self.pieceBB[color + 'K'].bit_length() - 1
+        return not (self._attackersTo(kingSq, enemyColor, occ) & ~SQUARE_BB[capturedSq])
+
+    def getKnightMoves(self, color, moves, targetMask=FULL, pinned=0):
+        targetMask &= ~self.colorBB[color]
+        enemy = self.colorBB['b' if color == 'w' else 'w']
+        # a pinned knight can never stay on the pin line
+        for sq in iterSquares(self.pieceBB[color + 'N'] & ~pinned):
+            self._addMoves(sq, KNIGHT_ATTACKS[sq] & targetMask, enemy, moves)
+
+    def _getSliderMoves(self, pieces, attackFn, color, moves, targetMask, pinned, pinRays):
+        targetMask &= ~self.colorBB[color]
+        enemy = self.colorBB['b' if color == 'w' else 'w']
+        occ = self.occupied
+        for sq in iterSquares(pieces):
+            targets = attackFn(sq, occ) & targetMask
+            if pinned & SQUARE_BB[sq]:
+                targets &= pinRays[sq]
+            self._addMoves(sq, targets, enemy, moves)
+
+    def getBishopMoves(self, color, moves, targetMask=FULL, pinned=0, pinRays=None):
+        self._getSliderMoves(self.pieceBB[color + 'B'], bishopAttacks, color, moves, targetMask, pinned, pinRays)
+
+    def getRookMoves(self, color, moves, targetMask=FULL, pinned=0, pinRays=None):
+        self._getSliderMoves(self.pieceBB[color + 'R'], rookAttacks, color, moves, targetMask, pinned, pinRays)
+
+    def getQueenMoves(self, color, moves, targetMask=FULL, pinned=0, pinRays=None):
+        self._getSliderMoves(self.pieceBB[color + 'Q'], queenAttacks, color, moves, targetMask, pinned, pinRays)
+
+    def getKingMoves(self, color, moves, legal=False, inCheck=False, targetMask=FULL):
+        own = self.colorBB[color]
+        enemyColor = 'b' if color == 'w' else 'w'
+        for sq in iterSquares(self.pieceBB[color + 'K']):
+            targets = KING_ATTACKS[sq] & ~own & targetMask
+            if legal:
+                # lift the king off the board so it can't hide behind itself on a slider's ray
+                occ = self.occupied ^ SQUARE_BB[sq]
+                for toSq in iterSquares(targets):
+                    if self._attackersTo(toSq, enemyColor, occ):
+                        targets ^= SQUARE_BB[toSq]
+            self._addMoves(sq, targets, self.colorBB[enemyColor], moves)
+            # castling lands on empty squares, skip it when the mask only allows captures
+            if not inCheck and targetMask & ~self.occupied:
+                self.getCastleMoves(sq // 8, sq % 8, moves)
 
     def getCastleMoves(self, r, c, moves):
         attackerIsWhite = not self.whiteToMove
         if self.isSquareAttacked(r, c, byWhite=attackerIsWhite):
             return
         
-        if self.whiteToMove:
-            if not self.whiteKingMoved:
-                # Kingside
-                if not self.whiteKingsRookMoved and self.board[7][5] == "--" and self.board[7][6] == "--":
-                    if not self.isSquareAttacked(7, 5, byWhite=attackerIsWhite) and not self.isSquareAttacked(7, 6, byWhite=attackerIsWhite):
-                        moves.append(Move((7, 4), (7, 6), self.board))  # king moves 2 squares
-                # Queenside
-                if not self.whiteQueensRookMoved and self.board[7][1] == "--" and self.board[7][2] == "--" and self.board[7][3] == "--":
-                    if not self.isSquareAttacked(7, 3, byWhite=attackerIsWhite) and not self.isSquareAttacked(7, 2, byWhite=attackerIsWhite):
-                        moves.append(Move((7, 4), (7, 2), self.board))
-        else:
-            if not self.blackKingMoved:
-                # Kingside
-                if not self.blackKingsRookMoved and self.board[0][5] == "--" and self.board[0][6] == "--":
-                    if not self.isSquareAttacked(0, 5, byWhite=attackerIsWhite) and not self.isSquareAttacked(0, 6, byWhite=attackerIsWhite):
-                        moves.append(Move((0, 4), (0, 6), self.board))
-                # Queenside
-                if not self.blackQueensRookMoved and self.board[0][1] == "--" and self.board[0][2] == "--" and self.board[0][3] == "--":
-                    if not self.isSquareAttacked(0, 3, byWhite=attackerIsWhite) and not self.isSquareAttacked(0, 2, byWhite=attackerIsWhite):
-                        moves.append(Move((0, 4), (0, 2), self.board))
+        row = 7 if self.whiteToMove else 0
+        kingside, queenside = (CASTLE_WK, CASTLE_WQ) if self.whiteToMove else (CASTLE_BK, CASTLE_BQ)
+        # Kingside
+        if self.castlingRights & kingside and self.board[row][5] == "--" and self.board[row][6] == "--":
+            if not self.isSquareAttacked(row, 5, byWhite=attackerIsWhite) and not self.isSquareAttacked(row, 6, byWhite=attackerIsWhite):
+                moves.append((row*8 + 4) | ((row*8 + 6) << 6) | (FLAG_KING_CASTLE << 12))  # king moves 2 squares
+        # Queenside
+        if self.castlingRights & queenside and self.board[row][1] == "--" and self.board[row][2] == "--" and self.board[row][3] == "--":
+            if not self.isSquareAttacked(row, 3, byWhite=attackerIsWhite) and not self.isSquareAttacked(row, 2, byWhite=attackerIsWhite):
+                moves.append((row*8 + 4) | ((row*8 + 2) << 6) | (FLAG_QUEEN_CASTLE << 12))
 
     # checks section
     def getValidMoves(self):
-    # save state that undoMove can't restore
-        savedFlags = (self.whiteKingMoved, self.blackKingMoved,
-                      self.whiteKingsRookMoved, self.whiteQueensRookMoved,
-                      self.blackKingsRookMoved, self.blackQueensRookMoved,
-                      self.enPassantTarget)
-        savedHistory = self.positionHistory.copy()
-        moves = self.getAllPossibleMoves()
+        # legal moves wrapped for the UI
+        return [Move(code, self.board) for code in self.getLegalMoves()]
+
+    def getLegalMoves(self, capturesOnly=False, quietsOnly=False):
+        # checkers and pins are found once, then every generator filters by mask,
+        # so legality never needs a make/undo.
+        # capturesOnly - captures and promotions, all evasions when in check
+        # quietsOnly - everything else, nothing when in check; the two split the legal moves
+        color = 'w' if self.whiteToMove else 'b'
+        enemyColor = 'b' if self.whiteToMove else 'w'
+        kingSq = self.pieceBB[color + 'K'].bit_length() - 1
+        checkers = self._attackersTo(kingSq, enemyColor, self.occupied)
         validMoves = []
-        for move in moves:
-            self.makeMove(move)
-            if not self.whiteToMove: # white moved
-                inCheck = self.isSquareAttacked(self.whiteKingPos[0], self.whiteKingPos[1], byWhite=False)
-            else:  # black moved
-                inCheck = self.isSquareAttacked(self.blackKingPos[0], self.blackKingPos[1], byWhite=True)
-            if not inCheck:
-                validMoves.append(move)
-            self.undoMove()
-            # restore flags after each undo
-            (self.whiteKingMoved, self.blackKingMoved,
-             self.whiteKingsRookMoved, self.whiteQueensRookMoved,
-             self.blackKingsRookMoved, self.blackQueensRookMoved,
-             self.enPassantTarget) = savedFlags
-            self.positionHistory = savedHistory.copy()
-            
-        if len(validMoves) == 0:
-            if self.whiteToMove:
-                inCheck = self.isSquareAttacked(self.whiteKingPos[0], self.whiteKingPos[1], byWhite=False)
+        if quietsOnly and checkers:
+            return validMoves
+
+        if checkers & (checkers - 1):
+            # double check - only the king can move
+            self.getKingMoves(color, validMoves, legal=True, inCheck=True)
+        else:
+            lastRowBB = 0xFF if color == 'w' else 0xFF << 56
+            if checkers:
+                # capture the checker or block between it and the king
+                targetMask = pawnMask = checkers | BETWEEN[kingSq][checkers.bit_length() - 1]
+                kingMask = FULL
+            elif capturesOnly:
+                targetMask = kingMask = self.colorBB[enemyColor]
+                pawnMask = targetMask | lastRowBB  # pushes onto the last row promote
+            elif quietsOnly:
+                targetMask = kingMask = ~self.occupied & FULL
+                pawnMask = targetMask & ~lastRowBB
             else:
-                inCheck = self.isSquareAttacked(self.blackKingPos[0], self.blackKingPos[1], byWhite=True)
+                targetMask = pawnMask = kingMask = FULL
+            pinned, pinRays = self._getPins(color, kingSq)
+            self.getPawnMoves(color, validMoves, pawnMask, pinned, pinRays, enPassant=not quietsOnly)
+            self.getKnightMoves(color, validMoves, targetMask, pinned)
+            self.getBishopMoves(color, validMoves, targetMask, pinned, pinRays)
+            self.getRookMoves(color, validMoves, targetMask, pinned, pinRays)
+            self.getQueenMoves(color, validMoves, targetMask, pinned, pinRays)
+            self.getKingMoves(color, validMoves, legal=True, inCheck=bool(checkers), targetMask=kingMask)
 
-            if inCheck:
+        if len(validMoves) == 0:
+            if checkers:
                 self.checkmate = True
-            else:
+            elif not capturesOnly and not quietsOnly:
                 self.stalemate = True
         else:
             self.checkmate = False
             self.stalemate = False
-        
-
 
         return validMoves
-    
+
+    def sideToMoveInCheck(self):
+        color = 'w' if self.whiteToMove else 'b'
+        kingSq = self.pieceBB[color + 'K'].bit_length() - 1
+        return bool(self._attackersTo(kingSq, 'b' if self.whiteToMove else 'w', self.occupied))
+
+    def _getPins(self, color, kingSq):
+        # enemy sliders lined up with the king through exactly one of our pieces
+        enemyColor = 'b' if color == 'w' else 'w'
+        bb = self.pieceBB
+        queens = bb[enemyColor + 'Q']
+        snipers = (rookAttacks(kingSq, 0) & (bb[enemyColor + 'R'] | queens)) | \
+                  (bishopAttacks(kingSq, 0) & (bb[enemyColor + 'B'] | queens))
+        own = self.colorBB[color]
+        pinned = 0
+        pinRays = {}
+        for sniperSq in iterSquares(snipers):
+            between = BETWEEN[kingSq][sniperSq]
+            blockers = between & self.occupied
+            if blockers and not blockers & (blockers - 1) and blockers & own:
+                pinned |= blockers
+                pinRays[blockers.bit_length() - 1] = between | SQUARE_BB[sniperSq]
+        return pinned, pinRays
+
+    def _attackersTo(self, sq, color, occ):
+        # all pieces of color attacking sq, with occ as the blocker set
+        bb = self.pieceBB
+        queens = bb[color + 'Q']
+        return (KNIGHT_ATTACKS[sq] & bb[color + 'N']) | \
+               (PAWN_ATTACKS['b' if color == 'w' else 'w'][sq] & bb[color + 'P']) | \
+               (KING_ATTACKS[sq] & bb[color + 'K']) | \
+               (bishopAttacks(sq, occ) & (bb[color + 'B'] | queens)) | \
+               (rookAttacks(sq, occ) & (bb[color + 'R'] | queens))
+
     def isSquareAttacked(self, r, c, byWhite):
-        savedTurn = self.whiteToMove
-        self.whiteToMove = byWhite # generate attacker moves
-        self.checkingAttack = True
-        attackerMoves = self.getAllPossibleMoves()
-        self.checkingAttack = False
-        self.whiteToMove = savedTurn # undo
-
-        for move in attackerMoves:
-            if move.endRow == r and move.endCol == c:
-                return True
+        # look outward from the square for each attacker pattern, stop at the first hit
+        sq = r*8 + c
+        color = 'w' if byWhite else 'b'
+        bb = self.pieceBB
+        if KNIGHT_ATTACKS[sq] & bb[color + 'N']:
+            return True
+        # attacker pawns sit where a pawn of the other color on sq would capture
+        if PAWN_ATTACKS['b' if byWhite else 'w'][sq] & bb[color + 'P']:
+            return True
+        if KING_ATTACKS[sq] & bb[color + 'K']:
+            return True
+        occ = self.occupied
+        queens = bb[color + 'Q']
+        if bishopAttacks(sq, occ) & (bb[color + 'B'] | queens):
+            return True
+        if rookAttacks(sq, occ) & (bb[color + 'R'] | queens):
+            return True
         return False
 
     def inCheck(self):
@@ -293,42 +634,6 @@ class ChessEngine:
         else:
             return self.isSquareAttacked(self.whiteKingPos[0], self.whiteKingPos[1], byWhite=False)
 
-    def undoMove(self):
-        if len(self.moveLog) == 0:
-            return
-
-        move = self.moveLog.pop()
-
-        self.board[move.startRow][move.startCol] = move.pieceMoved
-        self.board[move.endRow][move.endCol] = move.pieceCaptured
-
-        self.whiteToMove = not self.whiteToMove
-
-        if move.pieceMoved == "wK":
-            self.whiteKingPos = (move.startRow, move.startCol)
-        elif move.pieceMoved == "bK":
-            self.blackKingPos = (move.startRow, move.startCol)
-
-        # undo castling
-        if move.pieceMoved[1] == 'K' and abs(move.endCol - move.startCol) == 2:
-            if move.endCol == 6:  # kingside
-                self.board[move.endRow][7] = self.board[move.endRow][5]
-                self.board[move.endRow][5] = "--"
-            else:  # queenside
-                self.board[move.endRow][0] = self.board[move.endRow][3]
-                self.board[move.endRow][3] = "--"
-
-        # undo en passant
-        if move.enPassant:
-            self.board[move.endRow][move.endCol] = "--"
-            self.board[move.startRow][move.endCol] = move.pieceCaptured  # restore captured pawn
-        
-        key = self._boardKey()
-        if key in self.positionHistory:
-            self.positionHistory[key] -= 1
-            if self.positionHistory[key] == 0:
-                del self.positionHistory[key]
-
     # notation 
     def getMoveNotation(self, move):
         # after makeMove, whiteToMove is already flipped
@@ -344,16 +649,22 @@ class ChessEngine:
             isCheck = self.isSquareAttacked(self.blackKingPos[0], self.blackKingPos[1], byWhite=True)
 
         # disambiguation - if two pieces of the same type can move to the same square
+        # (looked up in the position before the move)
         disambig = ''
         if move.pieceMoved[1] not in ('P', 'K'):
+            self.popMove()
+            savedResult = (self.checkmate, self.stalemate)
             ambiguous = []
-            for m in self.getAllPossibleMoves():
-                if m != move and m.pieceMoved == move.pieceMoved and \
-                   m.endRow == move.endRow and m.endCol == move.endCol:
-                    ambiguous.append(m)
+            for code in self.getLegalMoves():
+                startRow, startCol = divmod(code & 63, 8)
+                if code != move.code and (code >> 6) & 63 == (move.code >> 6) & 63 and \
+                   self.board[startRow][startCol] == move.pieceMoved:
+                    ambiguous.append((startRow, startCol))
+            self.checkmate, self.stalemate = savedResult
+            self.pushMove(move.code)
             if ambiguous:
-                sameCol = any(m.startCol == move.startCol for m in ambiguous)
-                sameRow = any(m.startRow == move.startRow for m in ambiguous)
+                sameCol = any(c == move.startCol for r, c in ambiguous)
+                sameRow = any(r == move.startRow for r, c in ambiguous)
                 if not sameCol:
                     disambig = Move.colsToFiles[move.startCol]
                 elif not sameRow:
@@ -366,16 +677,7 @@ class ChessEngine:
     # for arrows in game, showing previous moves
     def getBoardAtMove(self, index): 
         # rebuild board to move index
-        board = [
-            ['bR', 'bN', 'bB', 'bQ', 'bK', 'bB', 'bN', 'bR'],
-            ['bP', 'bP', 'bP', 'bP', 'bP', 'bP', 'bP', 'bP'],
-            ['--', '--', '--', '--', '--', '--', '--', '--'],
-            ['--', '--', '--', '--', '--', '--', '--', '--'],
-            ['--', '--', '--', '--', '--', '--', '--', '--'],
-            ['--', '--', '--', '--', '--', '--', '--', '--'],
-            ['wP', 'wP', 'wP', 'wP', 'wP', 'wP', 'wP', 'wP'],
-            ['wR', 'wN', 'wB', 'wQ', 'wK', 'wB', 'wN', 'wR']
-        ]
+        board = [row[:] for row in self.startBoard]
         for i, move in enumerate(self.moveLog[:index]):
             board[move.startRow][move.startCol] = '--'
             board[move.endRow][move.endCol] = move.pieceMoved
@@ -392,13 +694,23 @@ class ChessEngine:
                 board[move.endRow][move.endCol] = move.promotionPiece
         return board
     
-    def _boardKey(self):
-        board_str = ''.join(''.join(row) for row in self.board)
-        flags = (self.whiteToMove,
-             self.whiteKingsRookMoved, self.whiteQueensRookMoved,
-             self.blackKingsRookMoved, self.blackQueensRookMoved)
-        return board_str + str(flags)
+    def repetitionCount(self):
+        # same side to move means every second entry, and nothing before the
+        # last capture or pawn move can repeat
+        key = self.zobristKey
+        history = self.hashHistory
+        last = len(history) - 1
+        stop = max(-1, last - self.halfmoveClock - 1)
+        count = 1
+        for i in range(last - 4, stop, -2):
+            if history[i] == key:
+                count += 1
+        return count
 
     def isThreefoldRepetition(self):
-        key = self._boardKey()
-        return self.positionHistory.get(key, 0) >= 3
\ No newline at end of file
+        return self.repetitionCount() >= 3
+
+# CHESS_PROFILE=1 times the hot paths in every process that imports the engine, see profiler.py
+if os.environ.get('CHESS_PROFILE', '') not in ('', '0'):
+    import profiler
+    profiler.enableFromEnv()
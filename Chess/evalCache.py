@@ -0,0 +1,98 @@
+# Network score cache keyed by ChessEngine.zobristKey, least recently used entries go first.
+# Kept for the bot's whole life, and optionally saved to disk so the opening positions
+# of the next session start out scored.
+import os
+from array import array
+from collections import OrderedDict
+
+# measured CPython cost of one entry (key, score, OrderedDict links)
+ENTRY_BYTES = 176
+FILE_MAGIC = b'EVC1'
+
+class EvalCache:
+    def __init__(self, sizeMB=16):
+        self.sizeMB = sizeMB
+        self.capacity = max(1, sizeMB * 1024 * 1024 // ENTRY_BYTES)
+        self.entries = OrderedDict()
+        self.resetStats()
+
+    def resetStats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def clear(self):
+        self.entries.clear()
+        self.resetStats()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        # no stats, no reordering - for checking what still needs scoring
+        return key in self.entries
+
+    def get(self, key):
+        score = self.entries.get(key)
+        if score is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return score
+
+    def put(self, key, score):
+        entries = self.entries
+        entries[key] = score
+        entries.move_to_end(key)
+        if len(entries) > self.capacity:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries':   len(self.entries),
+            'capacity':  self.capacity,
+            'hits':      self.hits,
+            'misses':    self.misses,
+            'evictions': self.evictions,
+            'hitRate':   self.hits / lookups if lookups else 0.0,
+        }
+
+    # file: magic, tag length, tag, entry count, keys (uint64), scores (int32)
+    # the tag identifies the network, scores from other weights are never loaded
+    def save(self, path, tag=b'', limit=None):
+        # the most recently used entries, up to limit
+        items = list(self.entries.items())
+        if limit is not None:
+            items = items[-limit:]
+        keys = array('Q', (key for key, _ in items))
+        scores = array('i', (score for _, score in items))
+        tmpPath = path + '.tmp'
+        with open(tmpPath, 'wb') as f:
+            f.write(FILE_MAGIC)
+            f.write(len(tag).to_bytes(2, 'little'))
+            f.write(tag)
+            f.write(len(items).to_bytes(4, 'little'))
+            keys.tofile(f)
+            scores.tofile(f)
+        os.replace(tmpPath, path)
+
+    def load(self, path, tag=b''):
+        # returns the number of entries read, 0 if the file is missing or for another network
+        if not os.path.exists(path):
+            return 0
+        with open(path, 'rb') as f:
+            if f.read(4) != FILE_MAGIC:
+                return 0
+            tagLength = int.from_bytes(f.read(2), 'little')
+            if f.read(tagLength) != tag:
+                return 0
+            count = int.from_bytes(f.read(4), 'little')
+            keys, scores = array('Q'), array('i')
+            keys.fromfile(f, count)
+            scores.fromfile(f, count)
+        for key, score in zip(keys, scores):
+            self.put(key, score)
+        return count
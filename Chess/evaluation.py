@@ -0,0 +1,110 @@
+# Piece values and piece-square tables for the hand-written evaluation.
+# The engine keeps their sum up to date incrementally, see ChessEngine.evaluate.
+
+PIECE_VALUES = {'P': 100, 'N': 320, 'B': 330, 'R': 500, 'Q': 900, 'K': 0}
+
+PAWN_TABLE_W = [
+    [0,  0,  0,  0,  0,  0,  0,  0],
+    [50, 50, 50, 50, 50, 50, 50, 50],
+    [10, 10, 20, 30, 30, 20, 10, 10],
+    [5,  5, 10, 25, 25, 10,  5,  5],
+    [0,  0,  0, 20, 20,  0,  0,  0],
+    [5, -5,-10,  0,  0,-10, -5,  5],
+    [5, 10, 10,-20,-20, 10, 10,  5],
+    [0,  0,  0,  0,  0,  0,  0,  0],
+]
+PAWN_TABLE_B = PAWN_TABLE_W[::-1]
+
+KNIGHT_TABLE = [
+    [-50,-40,-30,-30,-30,-30,-40,-50],
+    [-40,-20,  0,  0,  0,  0,-20,-40],
+    [-30,  0, 10, 15, 15, 10,  0,-30],
+    [-30,  5, 15, 20, 20, 15,  5,-30],
+    [-30,  0, 15, 20, 20, 15,  0,-30],
+    [-30,  5, 10, 15, 15, 10,  5,-30],
+    [-40,-20,  0,  5,  5,  0,-20,-40],
+    [-50,-40,-30,-30,-30,-30,-40,-50],
+]
+
+BISHOP_TABLE = [
+    [-20,-10,-10,-10,-10,-10,-10,-20],
+    [-10,  0,  0,  0,  0,  0,  0,-10],
+    [-10,  0,  5, 10, 10,  5,  0,-10],
+    [-10,  5,  5, 10, 10,  5,  5,-10],
+    [-10,  0, 10, 10, 10, 10,  0,-10],
+    [-10, 10, 10, 10, 10, 10, 10,-10],
+    [-10,  5,  0,  0,  0,  0,  5,-10],
+    [-20,-10,-10,-10,-10,-10,-10,-20],
+]
+
+ROOK_TABLE = [
+    [0,  0,  0,  0,  0,  0,  0,  0],
+    [5, 10, 10, 10, 10, 10, 10,  5],
+    [-5,  0,  0,  0,  0,  0,  0, -5],
+    [-5,  0,  0,  0,  0,  0,  0, -5],
+    [-5,  0,  0,  0,  0,  0,  0, -5],
+    [-5,  0,  0,  0,  0,  0,  0, -5],
+    [-5,  0,  0,  0,  0,  0,  0, -5],
+    [0,  0,  0,  5,  5,  0,  0,  0],
+]
+
+QUEEN_TABLE = [
+    [-20,-10,-10, -5, -5,-10,-10,-20],
+    [-10,  0,  0,  0,  0,  0,  0,-10],
+    [-10,  0,  5,  5,  5,  5,  0,-10],
+    [-5,   0,  5,  5,  5,  5,  0, -5],
+    [0,    0,  5,  5,  5,  5,  0, -5],
+    [-10,  5,  5,  5,  5,  5,  0,-10],
+    [-10,  0,  5,  0,  0,  0,  0,-10],
+    [-20,-10,-10, -5, -5,-10,-10,-20],
+]
+
+KING_TABLE_MID = [
+    [-30,-40,-40,-50,-50,-40,-40,-30],
+    [-30,-40,-40,-50,-50,-40,-40,-30],
+    [-30,-40,-40,-50,-50,-40,-40,-30],
+    [-30,-40,-40,-50,-50,-40,-40,-30],
+    [-20,-30,-30,-40,-40,-30,-30,-20],
+    [-10,-20,-20,-20,-20,-20,-20,-10],
+    [20,  20,  0,  0,  0,  0, 20, 20],
+    [20,  30, 10,  0,  0, 10, 30, 20],
+]
+KING_TABLE_MID_B = KING_TABLE_MID[::-1]
+
+# endgame king - walk to the center, the mating net is at the edge
+KING_TABLE_END = [
+    [-50,-40,-30,-20,-20,-30,-40,-50],
+    [-30,-20,-10,  0,  0,-10,-20,-30],
+    [-30,-10, 20, 30, 30, 20,-10,-30],
+    [-30,-10, 30, 40, 40, 30,-10,-30],
+    [-30,-10, 30, 40, 40, 30,-10,-30],
+    [-30,-10, 20, 30, 30, 20,-10,-30],
+    [-30,-30,  0,  0,  0,  0,-30,-30],
+    [-50,-30,-30,-30,-30,-30,-30,-50],
+]
+KING_TABLE_END_B = KING_TABLE_END[::-1]
+
+TABLES_W = {'P': PAWN_TABLE_W, 'N': KNIGHT_TABLE, 'B': BISHOP_TABLE,
+            'R': ROOK_TABLE,   'Q': QUEEN_TABLE,   'K': KING_TABLE_MID}
+TABLES_B = {'P': PAWN_TABLE_B, 'N': KNIGHT_TABLE, 'B': BISHOP_TABLE,
+            'R': ROOK_TABLE,   'Q': QUEEN_TABLE,   'K': KING_TABLE_MID_B}
+
+# game phase from the pieces left, MAX_PHASE with all minor and major pieces on the board
+PIECE_PHASE = {'P': 0, 'N': 1, 'B': 1, 'R': 2, 'Q': 4, 'K': 0}
+MAX_PHASE = 24
+
+def _buildPST(kingW, kingB):
+    # PST[piece][sq] - value + table bonus, negative for black, square = row * 8 + col
+    pst = {}
+    for color, tables in (('w', TABLES_W), ('b', TABLES_B)):
+        sign = 1 if color == 'w' else -1
+        for ptype, table in tables.items():
+            if ptype == 'K':
+                table = kingW if color == 'w' else kingB
+            pst[color + ptype] = [sign * (PIECE_VALUES[ptype] + table[sq >> 3][sq & 7]) for sq in range(64)]
+    return pst
+
+# middlegame and endgame only differ in the king table, the engine blends them by phase
+PST_MG = _buildPST(KING_TABLE_MID, KING_TABLE_MID_B)
+PST_EG = _buildPST(KING_TABLE_END, KING_TABLE_END_B)
+PHASE = {color + ptype: PIECE_PHASE[ptype] for color in 'wb' for ptype in PIECE_PHASE}
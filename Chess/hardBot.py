@@ -0,0 +1,101 @@
+# HardBot: the search from bot.py scored by a convolutional network.
+# Kept apart from bot.py so only this mode pays for importing torch.
+import os
+import hashlib
+import time
+import torch # type: ignore
+import torch.nn as nn # type: ignore
+from bot import SearchBot, MAX_DEPTH
+from encoding import PlaneEncoder, bitboards
+from evalCache import EvalCache
+from inference import optimizeModel
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), 'modelTraining', 'chess_model_hard.pth')
+EVAL_CACHE_SAVE_LIMIT = 100000  # entries written to disk, the most recently used
+
+class ChessNet(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.conv = nn.Sequential(
+            nn.Conv2d(12, 32, 3, padding=1), nn.BatchNorm2d(32), nn.ReLU(),
+            nn.Conv2d(32, 64, 3, padding=1), nn.BatchNorm2d(64), nn.ReLU(),
+            nn.Conv2d(64, 64, 3, padding=1), nn.BatchNorm2d(64), nn.ReLU(),
+        )
+        self.fc = nn.Sequential(
+            nn.Flatten(),
+            nn.Linear(64*8*8, 256), nn.ReLU(), nn.Dropout(0.3),
+            nn.Linear(256, 64),     nn.ReLU(),
+            nn.Linear(64, 1),       nn.Tanh()
+        )
+    def forward(self, x):
+        return self.fc(self.conv(x)).squeeze(1)
+
+class HardBot(SearchBot):
+    # network scores aren't in centipawns
+    deltaMargin = None
+    aspirationWindow = 500
+
+    def __init__(self, playAsWhite, ttSizeMB=16, maxDepth=MAX_DEPTH, batchSize=64, modelPath=MODEL_PATH,
+                 evalCacheMB=16, evalCachePath=None, inference='jit'):
+        super().__init__(playAsWhite, 4, ttSizeMB, maxDepth)
+        # quantized layers only have CPU kernels
+        useCuda = torch.cuda.is_available() and inference != 'int8'
+        self.device = torch.device('cuda' if useCuda else 'cpu')
+        model = ChessNet().to(self.device)
+        model.load_state_dict(torch.load(modelPath, map_location=self.device))
+        model.eval()
+        self.inference = inference
+        self.model = optimizeModel(model, inference, self.device)
+        # positions per forward pass, 1 evaluates every leaf on its own
+        self.batchSize = batchSize
+        self.batchLeaves = batchSize > 1
+        self.encoder = PlaneEncoder(max(1, batchSize))
+        # network scores for the bot's whole life, optionally kept on disk between sessions
+        self.evalCache = EvalCache(evalCacheMB)
+        self.evalCachePath = evalCachePath
+        with open(modelPath, 'rb') as f:
+            digest = hashlib.sha1(f.read())
+        digest.update(b'int8' if inference == 'int8' else b'float')  # quantized scores differ a little
+        self.modelTag = digest.hexdigest().encode()
+        if evalCachePath:
+            self.evalCache.load(evalCachePath, self.modelTag)
+
+    def close(self):
+        super().close()
+        if self.evalCachePath:
+            self.evalCache.save(self.evalCachePath, self.modelTag, EVAL_CACHE_SAVE_LIMIT)
+
+    def evaluateBoard(self, gs):
+        key = gs.zobristKey
+        score = self.evalCache.get(key)  # prefetched scores count as hits
+        if score is not None:
+            return score
+        t = time.perf_counter()
+        tensor = torch.from_numpy(self.encoder.encode(gs)).to(self.device)
+        with torch.no_grad():
+            score = int(self.model(tensor).item() * 10000)
+        self.nnTime += time.perf_counter() - t
+        self.evalCache.put(key, score)
+        return score
+
+    def prefetch(self, gs, moves):
+        # collect every child not scored yet, then one forward pass per batchSize positions
+        keys, rows = [], []
+        for move in moves:
+            gs.pushMove(move)
+            if gs.zobristKey not in self.evalCache:
+                keys.append(gs.zobristKey)
+                rows.append(bitboards(gs))
+            gs.popMove()
+        for i in range(0, len(rows), self.batchSize):
+            self.evaluateMany(keys[i:i + self.batchSize], rows[i:i + self.batchSize])
+
+    def evaluateMany(self, keys, rows):
+        # rows - bitboards() of each position, scores go to evalCache
+        t = time.perf_counter()
+        tensor = torch.from_numpy(self.encoder.encodeMany(rows)).to(self.device)
+        with torch.no_grad():
+            scores = self.model(tensor).tolist()
+        self.nnTime += time.perf_counter() - t
+        for key, score in zip(keys, scores):
+            self.evalCache.put(key, int(score * 10000))
@@ -0,0 +1,59 @@
+# Faster CPU inference for ChessNet, picked with createBot('hard', ..., inference=...).
+#   eager - the trained module as is
+#   fused - BatchNorm folded into the convolutions, dropout dropped
+#   jit   - fused, then traced and frozen with TorchScript so a forward pass skips python dispatch
+#   int8  - jit with the linear layers dynamically quantized to int8 (CPU only, slightly different scores)
+# benchmark.py inference compares the modes against the float model.
+import copy
+import warnings
+import torch # type: ignore
+import torch.nn as nn
+
+INFERENCE_MODES = ('eager', 'fused', 'jit', 'int8')
+
+def fuseModel(model):
+    # same outputs as model.eval(), with one layer less per convolution
+    layers = []
+    for module in list(model.conv) + list(model.fc):
+        if isinstance(module, nn.BatchNorm2d):
+            layers[-1] = torch.nn.utils.fusion.fuse_conv_bn_eval(layers[-1], module)
+        elif not isinstance(module, nn.Dropout):
+            layers.append(copy.deepcopy(module))
+    fused = nn.Sequential(*layers)
+    fused.eval()
+    return fused
+
+class _Squeeze(nn.Module):
+    # ChessNet.forward returns one score per position, not (n, 1)
+    def __init__(self, body):
+        super().__init__()
+        self.body = body
+
+    def forward(self, x):
+        return self.body(x).squeeze(1)
+
+def optimizeModel(model, mode, device):
+    # model - a ChessNet in eval mode with its weights loaded
+    if mode not in INFERENCE_MODES:
+        raise ValueError(f"unknown inference mode {mode!r}, expected one of {INFERENCE_MODES}")
+    if mode == 'eager':
+        return model
+    optimized = _Squeeze(fuseModel(model)).to(device)
+    optimized.eval()
+    if mode == 'fused':
+        return optimized
+    if mode == 'int8':
+        if device.type != 'cpu':
+            raise ValueError("int8 inference runs on the CPU only")
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            optimized = torch.ao.quantization.quantize_dynamic(optimized, {nn.Linear}, dtype=torch.qint8)
+    example = torch.zeros((1, 12, 8, 8), dtype=torch.float32, device=device)
+    # torch.compile would recompile for every batch size and take seconds to start, TorchScript
+    # is traced once - its deprecation warnings aren't useful here
+    with warnings.catch_warnings(), torch.no_grad():
+        warnings.simplefilter('ignore')
+        traced = torch.jit.trace(optimized, example)
+        if mode == 'jit':
+            traced = torch.jit.freeze(traced)  # weights become constants, quantized modules can't be frozen
+    return traced
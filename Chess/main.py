@@ -5,7 +5,8 @@ from datetime import datetime
 import engine
 from move import Move
 import menu
-from bot import createBot
+import profiler
+from botWorker import BotWorker, BOT_MOVE_EVENT, preload, discardPreload
 import random
 
 WIDTH = 512
@@ -25,9 +26,17 @@ def loadImages():
         IMAGES[piece] = p.transform.scale(p.image.load("Chess/img/" + piece + ".png"), (SQR_SIZE, SQR_SIZE))
         #IMAGES[piece] = p.image.load("Chess/img/" + piece + ".png")
 
+def preloadBot(mode):
+    # torch takes seconds to import, the worker starts on it while the player picks a time control.
+    # Picking another mode afterwards drops it, a local or Easy/Medium game shouldn't carry torch
+    if mode == 'hard':
+        preload()
+    else:
+        discardPreload()
+
 def main():
     p.init()
-    settings = menu.main()
+    settings = menu.main(preloadBot)
     
     screen = p.display.set_mode((WIDTH + PANEL_WIDTH, HEIGHT))
     clock = p.time.Clock()
@@ -47,9 +56,14 @@ def main():
 
     def triggerGameOver(winner, reason):
         nonlocal gameOver, gameOverResult, showGameOver
+        if bot is not None:
+            bot.cancel()
         gameOver = True
         gameOverResult = {'winner': winner, 'reason': reason}
         showGameOver = True
+        if profiler.enabled():
+            profiler.report(f"engine profile, game over: {winner} {reason}")
+            profiler.reset()
 
     mode = settings['mode']
     baseTime = settings['baseTime']
@@ -71,7 +85,9 @@ def main():
     bot = None
     if mode in ('easy', 'medium', 'hard'):
         botIsWhite = not playerIsWhite
-        bot = createBot(mode, botIsWhite)
+        bot = BotWorker(mode, botIsWhite)
+    else:
+        discardPreload()  # no bot in this game, don't keep a preloaded worker alive for it
     botMoveTime = None
 
     running = True
@@ -95,6 +111,31 @@ def main():
         for e in p.event.get():
             if e.type == p.QUIT:
                 running = False
+            elif e.type == BOT_MOVE_EVENT:
+                if bot is None or not bot.accept(e) or gameOver or e.code is None:
+                    continue
+                botMove = Move(e.code, gs.board)
+                gs.makeMove(botMove)
+                if gs.whiteToMove:
+                    blackTime += increment
+                else:
+                    whiteTime += increment
+                notation = gs.getMoveNotation(botMove)
+                moveHistory.append(notation)
+                validMoves = gs.getValidMoves()
+                viewIndex = len(gs.moveLog)
+                scrollOffset = max(0, (len(moveHistory)+1) // 2 - VISIBLE_LINES)
+                if gs.checkmate:
+                    if moveHistory:
+                        last = moveHistory[-1]
+                        if not last.endswith('#'):
+                            moveHistory[-1] = last.rstrip('+') + '#'
+                    winner = 'Black' if gs.whiteToMove else 'White'
+                    triggerGameOver(winner, 'by checkmate')
+                elif gs.isThreefoldRepetition():
+                    triggerGameOver('Draw', 'by threefold repetition')
+                elif gs.stalemate:
+                    triggerGameOver('Draw', 'by stalemate')
             elif e.type == p.MOUSEWHEEL:
                 total_lines = len(moveHistory)
                 scrollOffset -= e.y
@@ -165,6 +206,8 @@ def main():
                     else:
                         if actionRects.get('menu') and actionRects['menu'].collidepoint(x, y):
                             running = False
+                            if bot is not None:
+                                bot.close()
                             main()
                             return
                         elif actionRects.get('save') and actionRects['save'].collidepoint(x, y):
@@ -202,11 +245,15 @@ def main():
                         validMoves = []
                     else:
                         clickedMove = None
-                        for m in validMoves:
-                            if m.startRow == selected[0] and m.startCol == selected[1] and \
-                               m.endRow == row and m.endCol == col:
-                                clickedMove = m
-                                break
+                        # a promotion square has one move per piece, pick it after choosing
+                        candidates = [m for m in validMoves
+                                      if m.startRow == selected[0] and m.startCol == selected[1] and
+                                         m.endRow == row and m.endCol == col]
+                        if candidates:
+                            clickedMove = candidates[0]
+                            if clickedMove.promotionPending:
+                                promotionPiece = choosePromotion(screen, clickedMove, gs.whiteToMove, flipped)
+                                clickedMove = next(m for m in candidates if m.promotionPiece == promotionPiece)
                         if clickedMove:
                             gs.makeMove(clickedMove)
                             if gs.whiteToMove:
@@ -214,10 +261,6 @@ def main():
                             else:
                                 whiteTime += increment
 
-                            if clickedMove.promotionPending:
-                                promotionPiece = choosePromotion(screen, clickedMove, gs.whiteToMove, flipped)
-                                gs.board[clickedMove.endRow][clickedMove.endCol] = promotionPiece
-                                clickedMove.promotionPiece = promotionPiece
                             notation = gs.getMoveNotation(clickedMove)
                             moveHistory.append(notation)
                             
@@ -244,43 +287,18 @@ def main():
 
                         selected = None
                         validMoves = []
-            # bot move
-            if not gameOver and bot is not None:
-                if gs.whiteToMove == bot.playAsWhite:
+        # bot move, searched in the worker process, the answer arrives as BOT_MOVE_EVENT
+        if not gameOver and bot is not None:
+            if gs.whiteToMove == bot.playAsWhite:
+                if not bot.thinking():
                     now = p.time.get_ticks()
                     if botMoveTime is None:
                         botMoveTime = now + random.randint(200, 300)
                     elif now >= botMoveTime:
                         botMoveTime = None
-                        botMove = bot.getMove(gs)
-                        if botMove:
-                            gs.makeMove(botMove)
-                            if gs.whiteToMove:
-                                blackTime += increment
-                            else:
-                                whiteTime += increment
-                            if botMove.promotionPending and not botMove.promotionPiece:
-                                color = 'b' if not gs.whiteToMove else 'w'
-                                gs.board[botMove.endRow][botMove.endCol] = color + 'Q'
-                                botMove.promotionPiece = color + 'Q'
-                            notation = gs.getMoveNotation(botMove)
-                            moveHistory.append(notation)
-                            validMoves = gs.getValidMoves()
-                            viewIndex = len(gs.moveLog)
-                            scrollOffset = max(0, (len(moveHistory)+1) // 2 - VISIBLE_LINES)
-                            if gs.checkmate:
-                                if moveHistory:
-                                    last = moveHistory[-1]
-                                    if not last.endswith('#'):
-                                        moveHistory[-1] = last.rstrip('+') + '#'
-                                winner = 'Black' if gs.whiteToMove else 'White'
-                                triggerGameOver(winner, 'by checkmate')
-                            elif gs.isThreefoldRepetition():
-                                triggerGameOver('Draw', 'by threefold repetition')
-                            elif gs.stalemate:
-                                triggerGameOver('Draw', 'by stalemate')
-                else:
-                    botMoveTime = None 
+                        bot.start(gs, whiteTime if bot.playAsWhite else blackTime, increment)
+            else:
+                botMoveTime = None
 
         if viewMode:
             displayBoard = gs.getBoardAtMove(viewIndex)
@@ -313,6 +331,9 @@ def main():
         clock.tick(fps)
         p.display.flip()
 
+    if bot is not None:
+        bot.close()
+
 def drawBoard(screen, flipped=False):
     colors = [p.Color("white"), p.Color("gray")]
     for r in range(DIMENSION):
@@ -341,7 +362,7 @@ def choosePromotion(screen, move, whiteToMove, flipped=False):
     squareY = dr * SQR_SIZE
     
     pieces = ["Q", "R", "B", "N"]
-    color = "b" if whiteToMove else "w"
+    color = "w" if whiteToMove else "b"
    
     rects = []
     for i, pType in enumerate(pieces):
@@ -0,0 +1,225 @@
+# Headless bot-vs-bot matches: any two createBot configurations, games spread over a process pool.
+# Each opening is played twice with colours swapped, the result is the first bot's score with an
+# Elo difference and its 95% error bar, plus each bot's speed.
+# Run from the repo root:
+#   python Chess/match.py medium easy --games 40 --tc 10+0.1 --workers 4
+#   python Chess/match.py "hard:inference=int8" hard --games 20 --tc 30+0.5
+import argparse
+import ast
+import math
+import multiprocessing as mp
+import multiprocessing.util  # noqa: F401 - mp.util.Finalize
+import sys
+import time
+import engine
+from bot import createBot
+
+# balanced positions a few moves into common openings, white to move
+OPENINGS = [
+    ('italian',                'r1bqk1nr/pppp1ppp/2n5/2b1p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4'),
+    ('ruy lopez',              'r1bqkbnr/1ppp1ppp/p1n5/1B2p3/4P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 0 4'),
+    ('scotch',                 'r1bqkbnr/pppp1ppp/2n5/8/3pP3/5N2/PPP2PPP/RNBQKB1R w KQkq - 0 4'),
+    ('sicilian najdorf',       'rnbqkb1r/1p2pppp/p2p1n2/8/3NP3/2N5/PPP2PPP/R1BQKB1R w KQkq - 0 6'),
+    ('sicilian alapin',        'rnbqkb1r/pp1ppppp/8/2pnP3/8/2P5/PP1P1PPP/RNBQKBNR w KQkq - 1 4'),
+    ('french',                 'rnbqk1nr/ppp2ppp/4p3/3p4/1b1PP3/2N5/PPP2PPP/R1BQKBNR w KQkq - 2 4'),
+    ('caro-kann',              'rn1qkbnr/pp2pppp/2p5/3pPb2/3P4/8/PPP2PPP/RNBQKBNR w KQkq - 1 4'),
+    ('scandinavian',           'rnb1kbnr/ppp1pppp/8/q7/8/2N5/PPPP1PPP/R1BQKBNR w KQkq - 2 4'),
+    ('pirc',                   'rnbqkb1r/ppp1pp1p/3p1np1/8/3PP3/2N5/PPP2PPP/R1BQKBNR w KQkq - 0 4'),
+    ('alekhine',               'rnbqkb1r/ppp1pppp/3p4/3nP3/3P4/8/PPP2PPP/RNBQKBNR w KQkq - 0 4'),
+    ('queens gambit declined', 'rnbqkb1r/ppp2ppp/4pn2/3p4/2PP4/2N5/PP2PPPP/R1BQKBNR w KQkq - 2 4'),
+    ('slav',                   'rnbqkb1r/pp2pppp/2p2n2/3p4/2PP4/5N2/PP2PPPP/RNBQKB1R w KQkq - 2 4'),
+    ('queens gambit accepted', 'rnbqkb1r/ppp1pppp/5n2/8/2pP4/5N2/PP2PPPP/RNBQKB1R w KQkq - 2 4'),
+    ('kings indian',           'rnbqk2r/ppp1ppbp/3p1np1/8/2PPP3/2N5/PP3PPP/R1BQKBNR w KQkq - 0 5'),
+    ('nimzo-indian',           'rnbqk2r/pppp1ppp/4pn2/8/1bPP4/2N5/PP2PPPP/R1BQKBNR w KQkq - 2 4'),
+    ('grunfeld',               'rnbqkb1r/ppp1pp1p/5np1/3p4/2PP4/2N5/PP2PPPP/R1BQKBNR w KQkq - 0 4'),
+    ('dutch',                  'rnbqkb1r/pppp2pp/4pn2/5p2/3P4/6P1/PPP1PPBP/RNBQK1NR w KQkq - 0 4'),
+    ('london',                 'rnbqkb1r/pp2pppp/5n2/2pp4/3P1B2/4P3/PPP2PPP/RN1QKBNR w KQkq - 0 4'),
+    ('english',                'rnbqkb1r/ppp2ppp/5n2/3pp3/2P5/2N3P1/PP1PPP1P/R1BQKBNR w KQkq - 0 4'),
+    ('reti',                   'rnbqkb1r/ppp2ppp/4pn2/3p4/2P5/5NP1/PP1PPP1P/RNBQKB1R w KQkq - 1 4'),
+]
+
+MAX_PLIES = 300  # then adjudicated on material
+ADJUDICATE_MARGIN = 200  # centipawns ahead to be given the win at MAX_PLIES
+
+def parseSpec(spec):
+    # 'medium' or 'hard:inference=int8,batchSize=16' -> (mode, options)
+    mode, _, rest = spec.partition(':')
+    options = {}
+    for item in filter(None, rest.split(',')):
+        name, _, value = item.partition('=')
+        try:
+            options[name] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            options[name] = value  # plain strings don't need quotes
+    return mode, options
+
+def parseTimeControl(tc):
+    # '10+0.1' -> (10.0, 0.1) seconds per game and per move
+    base, _, increment = tc.partition('+')
+    return float(base), float(increment or 0)
+
+def insufficientMaterial(gs):
+    # kings only, or a single minor piece left - nobody can mate
+    pieces = [piece for row in gs.board for piece in row if piece != '--' and piece[1] != 'K']
+    return not pieces or (len(pieces) == 1 and pieces[0][1] in 'NB')
+
+def playGame(white, black, fen=engine.START_FEN, base=10.0, increment=0.1, maxPlies=MAX_PLIES):
+    # white's score 1 / 0.5 / 0, why the game ended, and {'w': ..., 'b': ...} moves, nodes, thinking time
+    gs = engine.ChessEngine(fen, validate=False)
+    clocks = {'w': base, 'b': base}
+    stats = {side: {'moves': 0, 'nodes': 0, 'time': 0.0} for side in 'wb'}
+    plies = 0
+    while True:
+        side = 'w' if gs.whiteToMove else 'b'
+        if not gs.getLegalMoves():
+            if gs.sideToMoveInCheck():
+                return (0 if side == 'w' else 1), 'checkmate', stats
+            return 0.5, 'stalemate', stats
+        if gs.isThreefoldRepetition():
+            return 0.5, 'repetition', stats
+        if gs.halfmoveClock >= 100:
+            return 0.5, 'fifty moves', stats
+        if insufficientMaterial(gs):
+            return 0.5, 'insufficient material', stats
+        if plies >= maxPlies:
+            score = gs.evaluate()
+            if abs(score) < ADJUDICATE_MARGIN:
+                return 0.5, 'adjudicated', stats
+            return (1 if score > 0 else 0), 'adjudicated', stats
+
+        bot = white if side == 'w' else black
+        t = time.perf_counter()
+        move = bot.getMove(gs, clocks[side], increment)
+        elapsed = time.perf_counter() - t
+        clocks[side] -= elapsed
+        if clocks[side] < 0:
+            return (0 if side == 'w' else 1), 'time', stats
+        clocks[side] += increment
+        s = stats[side]
+        s['moves'] += 1
+        s['nodes'] += getattr(bot, 'nodes', 0)
+        s['time'] += elapsed
+        gs.makeMove(move)
+        plies += 1
+
+_bots = {}  # per worker process, (spec, colour) -> bot, so HardBot loads its network once
+
+def _getBot(spec, playAsWhite):
+    key = (spec, playAsWhite)
+    if key not in _bots:
+        mode, options = parseSpec(spec)
+        _bots[key] = createBot(mode, playAsWhite, **options)
+    bot = _bots[key]
+    if getattr(bot, 'tt', None) is not None:
+        bot.tt.clear()  # every game starts from nothing, whatever this worker played before
+    return bot
+
+def _closeBots():
+    # Lazy SMP helpers and their shared table, HardBot's evaluation cache file
+    for bot in _bots.values():
+        if hasattr(bot, 'close'):
+            bot.close()
+    _bots.clear()
+
+def _initWorker():
+    # pool workers close their bots on the way out, Finalize runs when the pool shuts them down
+    mp.util.Finalize(None, _closeBots, exitpriority=10)
+
+def _runGame(task):
+    index, specA, specB, aIsWhite, openingName, fen, base, increment = task
+    white = _getBot(specA if aIsWhite else specB, True)
+    black = _getBot(specB if aIsWhite else specA, False)
+    result, reason, stats = playGame(white, black, fen, base, increment)
+    # everything from the first bot's side
+    return {
+        'index': index, 'opening': openingName, 'aIsWhite': aIsWhite, 'reason': reason,
+        'score': result if aIsWhite else 1 - result,
+        'a': stats['w' if aIsWhite else 'b'], 'b': stats['b' if aIsWhite else 'w'],
+    }
+
+def eloDifference(wins, draws, losses, z=1.96):
+    # Elo of the first bot over the second and the 95% margin, from a Wilson interval on the score -
+    # it doesn't collapse to nothing when every game ended the same way.
+    # A sweep has no finite estimate: +-inf Elo and an infinite margin
+    games = wins + draws + losses
+    score = (wins + draws / 2) / games
+
+    def elo(p):
+        if p <= 0:
+            return -math.inf
+        if p >= 1:
+            return math.inf
+        return -400 * math.log10(1 / p - 1)
+
+    if score in (0, 1):
+        return elo(score), math.inf
+    centre = (score + z * z / (2 * games)) / (1 + z * z / games)
+    spread = z * math.sqrt(score * (1 - score) / games + z * z / (4 * games * games)) / (1 + z * z / games)
+    return elo(score), (elo(centre + spread) - elo(centre - spread)) / 2
+
+def runMatch(specA, specB, games=20, base=10.0, increment=0.1, workers=1, log=print):
+    # returns the list of game records; workers=1 plays in this process (so bots can use workers=N themselves)
+    tasks = []
+    for i in range(games):
+        name, fen = OPENINGS[(i // 2) % len(OPENINGS)]
+        tasks.append((i, specA, specB, i % 2 == 0, name, fen, base, increment))
+    records = []
+    if workers > 1 and any(parseSpec(spec)[1].get('workers', 1) > 1 for spec in (specA, specB)):
+        # pool processes are daemonic and can't start a bot's Lazy SMP helpers
+        log("  a bot uses helper processes, playing the games one at a time in this process")
+        workers = 1
+    if workers > 1:
+        # spawn - pygame/torch state in a forked copy isn't safe
+        pool = mp.get_context('spawn').Pool(workers, initializer=_initWorker)
+        results = pool.imap_unordered(_runGame, tasks)
+    else:
+        pool = None
+        results = map(_runGame, tasks)
+    try:
+        for record in results:
+            records.append(record)
+            result = {1: '1-0', 0.5: '1/2', 0: '0-1'}[record['score']]
+            colour = 'white' if record['aIsWhite'] else 'black'
+            log(f"  game {len(records):3}/{games}  {record['opening']:22} {specA} ({colour}) {result:3}  "
+                f"{record['reason']}")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        else:
+            _closeBots()
+    return records
+
+def report(specA, specB, records, log=print):
+    wins = sum(r['score'] == 1 for r in records)
+    draws = sum(r['score'] == 0.5 for r in records)
+    losses = len(records) - wins - draws
+    elo, margin = eloDifference(wins, draws, losses)
+    eloText = f"{round(elo):+d}" if math.isfinite(elo) else f"{elo:+}"
+    marginText = f"+/- {margin:.0f}" if math.isfinite(margin) else "unbounded"
+    log(f"{specA} vs {specB}: {wins + draws / 2}/{len(records)} (+{wins} ={draws} -{losses})  "
+        f"Elo {eloText} {marginText} (95%)")
+    for key, spec in (('a', specA), ('b', specB)):
+        moves = sum(r[key]['moves'] for r in records)
+        nodes = sum(r[key]['nodes'] for r in records)
+        seconds = sum(r[key]['time'] for r in records)
+        nps = f"{nodes / seconds:8.0f} nodes/s" if seconds and nodes else "       - nodes/s"
+        log(f"  {spec:24} {nps}  {seconds / max(moves, 1):6.3f}s per move  {moves} moves")
+    return elo, margin
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="headless match between two bot configurations")
+    parser.add_argument('first', help="mode[:option=value,...], e.g. medium or hard:inference=int8")
+    parser.add_argument('second')
+    parser.add_argument('--games', type=int, default=20)
+    parser.add_argument('--tc', default='10+0.1', help="seconds per game + increment per move")
+    parser.add_argument('--workers', type=int, default=mp.cpu_count())
+    args = parser.parse_args(argv)
+    base, increment = parseTimeControl(args.tc)
+    print(f"{args.first} vs {args.second}, {args.games} games, {args.tc}, {args.workers} workers")
+    records = runMatch(args.first, args.second, args.games, base, increment, args.workers)
+    report(args.first, args.second, records)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
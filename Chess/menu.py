@@ -198,7 +198,8 @@ def getHover(mx, my, modeRects, timeRects, colorRects, startRect):
         return ('start',)
     return None
 
-def main():
+def main(onModeSelected=None):
+    # onModeSelected(mode) - called on each mode click, e.g. to start loading the Hard bot early
     state      = MenuState()
     clock      = p.time.Clock()
     startRect  = None
@@ -221,6 +222,8 @@ def main():
                     continue
                 if h[0] == 'mode':
                     state.selectedMode = h[1]
+                    if onModeSelected:
+                        onModeSelected(h[1])
                 elif h[0] == 'time':
                     state.selectedTime = h[1]
                 elif h[0] == 'color':
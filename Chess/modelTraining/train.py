@@ -5,6 +5,7 @@ import torch.nn as nn
 from torch.utils.data import DataLoader, TensorDataset
 import glob
 import random
+import sys
 from tqdm import tqdm
 
 class ChessNet(nn.Module):
@@ -24,10 +25,35 @@ class ChessNet(nn.Module):
     def forward(self, x):
         return self.fc(self.conv(x)).squeeze(1)
 
+# NNUE-style network for nnueBot.py: the 12x8x8 planes are 768 piece-square features,
+# first layer clipped to [0, 1] like the bot's int16 accumulator
+class NnueNet(nn.Module):
+    def __init__(self, hidden=256, l1=32):
+        super().__init__()
+        self.ft  = nn.Linear(768, hidden)
+        self.l1  = nn.Linear(hidden, l1)
+        self.out = nn.Linear(l1, 1)
+    def forward(self, x):
+        x = torch.clamp(self.ft(x.flatten(1)), 0, 1)
+        x = torch.relu(self.l1(x))
+        return torch.tanh(self.out(x)).squeeze(1)
+
+def exportNnue(model, path):
+    # float weights in the layout nnueBot.NnueNetwork loads, the bot quantizes the first layer itself
+    w = {k: v.detach().cpu().numpy() for k, v in model.state_dict().items()}
+    np.savez(path,
+             ftWeight=w['ft.weight'].T.copy(), ftBias=w['ft.bias'],
+             l1Weight=w['l1.weight'], l1Bias=w['l1.bias'],
+             outWeight=w['out.weight'][0], outBias=w['out.bias'][0])
+
+# python train.py        -> chess_model_hard.pth (HardBot)
+# python train.py nnue   -> chess_model_nnue.npz (NnueBot), same dataset
+MODEL = sys.argv[1] if len(sys.argv) > 1 else 'hard'
+
 device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 print(f"Using device: {device}")
 
-model     = ChessNet().to(device)
+model     = (NnueNet() if MODEL == 'nnue' else ChessNet()).to(device)
 optimizer = torch.optim.Adam(model.parameters(), lr=1e-3, weight_decay=1e-4)
 scheduler = torch.optim.lr_scheduler.StepLR(optimizer, step_size=3, gamma=0.5)
 criterion = nn.MSELoss()
@@ -89,7 +115,10 @@ for epoch in range(EPOCHS):
     if val_loss < best_val_loss:
         best_val_loss = val_loss
         no_improve    = 0
-        torch.save(model.state_dict(), 'chess_model_hard.pth')
+        if MODEL == 'nnue':
+            exportNnue(model, 'chess_model_nnue.npz')
+        else:
+            torch.save(model.state_dict(), 'chess_model_hard.pth')
         print("  -> saved best model")
     else:
         no_improve += 1
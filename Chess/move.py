@@ -1,40 +1,72 @@
+# Moves are 16-bit ints inside the engine and the bots:
+# bits 0-5 start square, 6-11 end square, 12-15 flags (square = row * 8 + col)
+FLAG_QUIET        = 0
+FLAG_DOUBLE_PUSH  = 1
+FLAG_KING_CASTLE  = 2
+FLAG_QUEEN_CASTLE = 3
+FLAG_CAPTURE      = 4
+FLAG_EN_PASSANT   = 5
+FLAG_PROMOTION    = 8   # + index into PROMOTION_PIECES, + FLAG_CAPTURE when taking
+
+PROMOTION_PIECES = 'NBRQ'
+
+def encodeMove(startSq, endSq, flag=FLAG_QUIET):
+    return startSq | (endSq << 6) | (flag << 12)
+
+def moveStart(code):
+    return code & 63
+
+def moveEnd(code):
+    return (code >> 6) & 63
+
+def moveFlag(code):
+    return code >> 12
+
+def isCapture(code):
+    return code & 0x4000
+
+def isPromotion(code):
+    return code & 0x8000
+
 class Move:
+    # lightweight wrapper around a move code, for the UI and notation
+    __slots__ = ('code', 'startRow', 'startCol', 'endRow', 'endCol',
+                 'pieceMoved', 'pieceCaptured', 'promotionPending', 'promotionPiece',
+                 'enPassant', 'isCastle', 'stats')
+
     rowsToRanks = {7: '1', 6: '2', 5: '3', 4: '4', 3: '5', 2: '6', 1: '7', 0: '8'}
     colsToFiles = {0: 'a', 1: 'b', 2: 'c', 3: 'd', 4: 'e', 5: 'f', 6: 'g', 7: 'h'}
     pieceToNotation = {'K': 'K', 'Q': 'Q', 'R': 'R', 'B': 'B', 'N': 'N', 'P': ''}
 
-    def __init__(self, startSq, endSq, board, enPassant=False):
-        self.startRow = startSq[0]
-        self.startCol = startSq[1]
-        self.endRow = endSq[0]
-        self.endCol = endSq[1]
+    def __init__(self, code, board):
+        self.code = code
+        self.startRow, self.startCol = divmod(code & 63, 8)
+        self.endRow, self.endCol = divmod((code >> 6) & 63, 8)
+        flag = code >> 12
 
         self.pieceMoved = board[self.startRow][self.startCol]
         self.pieceCaptured = board[self.endRow][self.endCol]
 
-        self.promotionPending = False
+        self.enPassant = flag == FLAG_EN_PASSANT
+        self.isCastle = flag in (FLAG_KING_CASTLE, FLAG_QUEEN_CASTLE)
+        self.promotionPending = bool(flag & FLAG_PROMOTION)
         self.promotionPiece = None
-        self.enPassant = enPassant
-        self.isCastle = False
+        self.stats = None  # the search's statistics when a search bot chose the move, see SearchBot.searchStats
+        if self.promotionPending:
+            self.promotionPiece = self.pieceMoved[0] + PROMOTION_PIECES[flag & 3]
 
-        if enPassant:
+        if self.enPassant:
             self.pieceCaptured = board[self.startRow][self.endCol]
 
-        
-        # compare 1 integer instead of 4, faster
-        self.moveID = (
-            self.startRow * 1000 +
-            self.startCol * 100 +
-            self.endRow * 10 +
-            self.endCol
-        )
-
     def __eq__(self, other):
-        return isinstance(other, Move) and self.moveID == other.moveID
+        return isinstance(other, Move) and self.code == other.code
+
+    def __hash__(self):
+        return self.code
 
     def __str__(self):
         return f"{self.pieceMoved}: ({self.startRow},{self.startCol}) -> ({self.endRow},{self.endCol})"
-    
+
     def getNotation(self, isCheck=False, isCheckmate=False, disambig=''):
         file = self.colsToFiles[self.endCol]
         rank = self.rowsToRanks[self.endRow]
@@ -45,7 +77,7 @@ class Move:
                 return 'O-O' + suffix
             else:
                 return 'O-O-O' + suffix
-            
+
         capture = ''
         if self.pieceCaptured != '--' or self.enPassant:
             capture = 'x'
@@ -55,17 +87,15 @@ class Move:
         promotion = ''
         if self.promotionPending and self.promotionPiece:
             promotion = '=' + self.promotionPiece[1]
-        
+
         return f"{pieceStr}{disambig}{capture}{file}{rank}{promotion}{suffix}"
 
 
 '''
-moveID xample
-(startRow)(startCol)(endRow)(endCol)
-(6,4) -> (4,4)
-6*1000 = 6000
-4*100  = 400
-4*10   = 40
-4      = 4
-         6444
-'''
\ No newline at end of file
+move code example
+(6,4) -> (4,4), white pawn double push e2e4
+start = 6*8 + 4 = 52
+end   = 4*8 + 4 = 36
+flag  = FLAG_DOUBLE_PUSH = 1
+code  = 52 | 36 << 6 | 1 << 12 = 6452
+'''
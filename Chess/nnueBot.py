@@ -0,0 +1,103 @@
+# NnueBot: the search from bot.py scored by a small NNUE-style network, numpy only.
+# Input: 768 piece-square features (12 pieces x 64 squares, the same planes as ChessNet's input
+# flattened), so the first layer is just the sum of one weight row per piece on the board.
+# That sum - the accumulator - lives on the engine and is updated by _putPiece/_removePiece,
+# a move costs two or three int16 row additions instead of a full first layer.
+# Trained with `python train.py nnue` in modelTraining, which writes chess_model_nnue.npz.
+import os
+import math
+import time
+import numpy as np # type: ignore
+from bot import SearchBot, MAX_DEPTH
+from engine import PIECES
+
+NNUE_PATH = os.path.join(os.path.dirname(__file__), 'modelTraining', 'chess_model_nnue.npz')
+FEATURES = 768
+QA = 127  # accumulator scale, clipped ReLU maps [0, 1] to [0, QA]
+
+def featureIndex(piece, sq):
+    # same order as the network input planes, plane * 64 + row * 8 + col
+    return PIECES.index(piece) * 64 + sq
+
+class NnueNetwork:
+    # weights file (float32): ftWeight (768, H), ftBias (H), l1Weight (L, H), l1Bias (L),
+    # outWeight (L), outBias () - layers 768 -> H -> clipped ReLU -> L -> ReLU -> 1 -> tanh
+    def __init__(self, path=NNUE_PATH):
+        with np.load(path) as w:
+            ftWeight, ftBias = w['ftWeight'], w['ftBias']
+            self.l1Weight = (w['l1Weight'] / QA).astype(np.float32)  # takes the accumulator unscaled
+            self.l1Bias = w['l1Bias'].astype(np.float32)
+            self.outWeight = w['outWeight'].astype(np.float32)
+            self.outBias = float(w['outBias'])
+        self.hidden = ftWeight.shape[1]
+        self.ftWeight = np.clip(np.round(ftWeight * QA), -32768, 32767).astype(np.int16)
+        self.ftBias = np.clip(np.round(ftBias * QA), -32768, 32767).astype(np.int16)
+        self._x = np.zeros(self.hidden, dtype=np.float32)
+
+    def attach(self, gs):
+        # gives gs an accumulator for its current position, the engine keeps it up to date from here
+        gs.accumulator = Accumulator(self)
+        gs.accumulator.refresh(gs)
+        return gs.accumulator
+
+    def evaluate(self, values):
+        # white's score in [-1, 1] from an accumulator's values
+        x = self._x
+        x[:] = values
+        np.maximum(x, 0.0, out=x)  # clipped ReLU, np.clip is several times slower at this size
+        np.minimum(x, QA, out=x)
+        h = self.l1Weight @ x
+        h += self.l1Bias
+        np.maximum(h, 0, out=h)
+        return math.tanh(float(self.outWeight @ h) + self.outBias)
+
+class Accumulator:
+    # int16 arithmetic wraps, so a move and its undo always cancel exactly
+    def __init__(self, network):
+        self.network = network
+        self.rows = {piece: network.ftWeight[i * 64:(i + 1) * 64] for i, piece in enumerate(PIECES)}
+        self.values = network.ftBias.copy()
+
+    def add(self, piece, sq):
+        self.values += self.rows[piece][sq]
+
+    def sub(self, piece, sq):
+        self.values -= self.rows[piece][sq]
+
+    def refresh(self, gs):
+        values = self.network.ftBias.copy()
+        for r in range(8):
+            for c in range(8):
+                piece = gs.board[r][c]
+                if piece != '--':
+                    values += self.rows[piece][r * 8 + c]
+        self.values = values
+
+class NnueBot(SearchBot):
+    # same score scale as HardBot
+    deltaMargin = None
+    aspirationWindow = 500
+
+    def __init__(self, playAsWhite, depth=4, ttSizeMB=16, maxDepth=MAX_DEPTH, modelPath=NNUE_PATH):
+        super().__init__(playAsWhite, depth, ttSizeMB, maxDepth)
+        self.network = NnueNetwork(modelPath)
+
+    def getMove(self, gs, timeLeft=None, increment=0):
+        self.network.attach(gs)
+        try:
+            return super().getMove(gs, timeLeft, increment)
+        finally:
+            gs.accumulator = None  # other code using gs shouldn't pay for the updates
+
+    def helpSearch(self, gs, startDepth):
+        self.network.attach(gs)
+        try:
+            super().helpSearch(gs, startDepth)
+        finally:
+            gs.accumulator = None
+
+    def evaluateBoard(self, gs):
+        t = time.perf_counter()
+        score = int(self.network.evaluate(gs.accumulator.values) * 10000)
+        self.nnTime += time.perf_counter() - t
+        return score
@@ -0,0 +1,125 @@
+# Staged move ordering shared by the search bots.
+# Order: TT move, good captures (MVV-LVA), killer moves, bad captures, quiet moves by history.
+# Quiet moves are only generated once the search gets past the good captures,
+# so a cutoff on the TT move or a capture never pays for them.
+import time
+from move import FLAG_EN_PASSANT, FLAG_PROMOTION
+
+MAX_PLY = 64
+TACTICAL = 0xC000  # capture or promotion bit of a move code
+HISTORY_MAX = 1 << 20  # history scores are halved when one gets this big
+
+# only the order matters for MVV-LVA
+ORDER_VALUES = {'P': 1, 'N': 3, 'B': 3, 'R': 5, 'Q': 9, 'K': 0}
+PROMOTION_VALUES = (3, 3, 5, 9)  # same index as PROMOTION_PIECES
+
+def mvvLva(board, code):
+    # most valuable victim first, cheapest attacker breaks ties, promotions count the new piece
+    s = 0
+    flag = code >> 12
+    if code & 0x4000:
+        endSq, startSq = (code >> 6) & 63, code & 63
+        victim = 'P' if flag == FLAG_EN_PASSANT else board[endSq >> 3][endSq & 7][1]
+        s += 10 * ORDER_VALUES[victim] - ORDER_VALUES[board[startSq >> 3][startSq & 7][1]]
+    if flag & FLAG_PROMOTION:
+        s += 10 * PROMOTION_VALUES[flag & 3]
+    return s
+
+def sortCaptures(board, moves):
+    scored = [(mvvLva(board, m), m) for m in moves]
+    scored.sort(reverse=True)
+    return [m for _, m in scored]
+
+def isGoodCapture(board, code):
+    # can't lose material to a single recapture: victim worth at least the attacker, or a queen promotion
+    flag = code >> 12
+    if flag & FLAG_PROMOTION:
+        return flag & 3 == 3
+    startSq, endSq = code & 63, (code >> 6) & 63
+    victim = 'P' if flag == FLAG_EN_PASSANT else board[endSq >> 3][endSq & 7][1]
+    return ORDER_VALUES[victim] >= ORDER_VALUES[board[startSq >> 3][startSq & 7][1]]
+
+class MoveOrderer:
+    def __init__(self):
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = [[0] * 64 for _ in range(64)]  # [from][to]
+        self.movegenTime = 0.0  # seconds in move generation, reset by the search with its other stats
+
+    def newSearch(self):
+        # killers belong to one position's tree, history carries over at half weight
+        for k in self.killers:
+            k[0] = k[1] = None
+        self.ageHistory()
+
+    def ageHistory(self):
+        for row in self.history:
+            for to in range(64):
+                row[to] >>= 1
+
+    def addCutoff(self, move, ply, depth):
+        # a quiet move refuted the opponent's last move, try it early in sibling positions
+        if move & TACTICAL:
+            return
+        if ply < MAX_PLY:
+            k = self.killers[ply]
+            if k[0] != move:
+                k[1] = k[0]
+                k[0] = move
+        row = self.history[move & 63]
+        to = (move >> 6) & 63
+        row[to] += depth * depth
+        if row[to] > HISTORY_MAX:
+            self.ageHistory()
+
+    def orderedMoves(self, gs, ply, ttMove=None):
+        # generator, the search stops pulling moves after a cutoff.
+        # gs has to be back in the same position whenever the next move is taken
+        board = gs.board
+        t = time.perf_counter()
+        tactical = gs.getLegalMoves(capturesOnly=True)  # every evasion when in check
+        quiets = None
+        if ttMove is not None and ttMove not in tactical:
+            if ttMove & TACTICAL:
+                ttMove = None
+            else:
+                quiets = gs.getLegalMoves(quietsOnly=True)
+                if ttMove not in quiets:
+                    ttMove = None
+        self.movegenTime += time.perf_counter() - t
+        if ttMove is not None:
+            yield ttMove
+
+        good, bad, evasions = [], [], []
+        for m in tactical:
+            if m == ttMove:
+                continue
+            if not m & TACTICAL:
+                evasions.append(m)  # quiet check evasion, ordered with the quiets
+            elif isGoodCapture(board, m):
+                good.append((mvvLva(board, m), m))
+            else:
+                bad.append((mvvLva(board, m), m))
+        good.sort(reverse=True)
+        for _, m in good:
+            yield m
+
+        if quiets is None:
+            t = time.perf_counter()
+            quiets = gs.getLegalMoves(quietsOnly=True)
+            self.movegenTime += time.perf_counter() - t
+        quiets += evasions
+        killers = tuple(self.killers[ply]) if ply < MAX_PLY else (None, None)
+        for k in killers:
+            if k is not None and k != ttMove and k in quiets:
+                yield k
+
+        bad.sort(reverse=True)
+        for _, m in bad:
+            yield m
+
+        history = self.history
+        scored = [(history[m & 63][(m >> 6) & 63], m) for m in quiets
+                  if m != ttMove and m != killers[0] and m != killers[1]]
+        scored.sort(reverse=True)
+        for _, m in scored:
+            yield m
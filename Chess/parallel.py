@@ -0,0 +1,102 @@
+# Lazy SMP: helper processes run the same iterative deepening as the bot on their own engine copy,
+# sharing one transposition table in shared memory. They never return a move - their entries
+# give the main search better move ordering and earlier cutoffs, which is where the speedup comes from.
+# createBot(mode, playAsWhite, workers=N) sets it up with N - 1 helpers.
+import multiprocessing as mp
+import queue
+import engine
+from transposition import SharedTranspositionTable
+
+def _helperLoop(botClass, playAsWhite, options, ttName, ttSizeMB, index, requests, done, stopEvent):
+    bot = botClass(playAsWhite, **dict(options, ttSizeMB=0))
+    bot.tt = SharedTranspositionTable(ttSizeMB, name=ttName)
+    bot.stopEvent = stopEvent
+    done.put(('ready', index))
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        fen, codes, generation = request
+        gs = engine.ChessEngine(fen, validate=False)
+        for code in codes:
+            gs.pushMove(code)
+        bot.tt.generation = generation
+        # half the helpers one ply ahead, so they don't all finish the same iterations together
+        bot.helpSearch(gs, 1 + index % 2)
+        done.put(('done', index))
+    bot.tt.close()
+
+class LazySMP:
+    def __init__(self, botClass, playAsWhite, options, helpers, ttSizeMB=16):
+        # options - the bot's constructor options, helpers get the same ones without a table of their own
+        self.tt = SharedTranspositionTable(ttSizeMB)
+        ctx = mp.get_context('spawn')
+        self.stopEvent = ctx.Event()
+        self.done = ctx.Queue()
+        self.requests = []
+        self.processes = []
+        try:
+            for i in range(helpers):
+                requests = ctx.Queue()
+                process = ctx.Process(target=_helperLoop, daemon=True,
+                                      args=(botClass, playAsWhite, options, self.tt.name, ttSizeMB, i,
+                                            requests, self.done, self.stopEvent))
+                process.start()
+                self.requests.append(requests)
+                self.processes.append(process)
+        except BaseException:
+            # e.g. from a daemonic process, which can't have children - don't leave the table behind
+            for process in self.processes:
+                process.terminate()
+            self.tt.close()
+            raise
+        # helpers load their bot in the background (seconds for HardBot), searches only go to ready ones
+        self.ready = [False] * helpers
+        self.active = 0  # helpers searching, each answers stop with a 'done' message
+
+    def _receive(self, timeout):
+        kind, index = self.done.get(timeout=timeout)
+        if kind == 'ready':
+            self.ready[index] = True
+        else:
+            self.active -= 1
+
+    def waitReady(self, timeout=60):
+        while not all(self.ready):
+            self._receive(timeout)
+
+    def start(self, gs):
+        # helpers start searching gs, the table's generation has to be set for this search already
+        self.stop()
+        while True:
+            try:
+                self._receive(0)
+            except queue.Empty:
+                break
+        self.stopEvent.clear()
+        codes = [entry[0] for entry in gs.undoStack]
+        for requests, ready in zip(self.requests, self.ready):
+            if ready:
+                requests.put((gs.startFen, codes, self.tt.generation))
+                self.active += 1
+
+    def stop(self):
+        # returns once every helper is idle, so the next start can't be mistaken for this one
+        if not self.active:
+            return
+        self.stopEvent.set()
+        while self.active:
+            try:
+                self._receive(5)
+            except queue.Empty:
+                self.active = 0  # a helper died, don't wait for it forever
+
+    def close(self):
+        self.stop()
+        for requests in self.requests:
+            requests.put(None)
+        for process in self.processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+        self.tt.close()
@@ -0,0 +1,142 @@
+# Move generator correctness and speed: perft counts every legal move sequence to a depth,
+# which has to match the published counts for these positions exactly.
+# Run from the repo root:
+#   python Chess/perft.py                     whole suite, nodes per second vs the recorded baseline
+#   python Chess/perft.py --save-baseline     record this machine's speed as the new baseline
+#   python Chess/perft.py divide 3 [fen]      count per root move, for finding a bug against another engine
+import argparse
+import json
+import os
+import sys
+import time
+import engine
+from engine import START_FEN
+from move import FLAG_PROMOTION, PROMOTION_PIECES
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'perft_baseline.json')
+
+# name, fen, known counts from depth 1, depth the suite runs to
+SUITE = [
+    ('start', START_FEN, [20, 400, 8902, 197281, 4865609], 4),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+     [48, 2039, 97862, 4085603], 3),
+    ('position3', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1', [14, 191, 2812, 43238, 674624], 5),
+    ('position4', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+     [6, 264, 9467, 422333], 4),
+    ('position5', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8', [44, 1486, 62379, 2103487], 3),
+    ('position6', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+     [46, 2079, 89890, 3894594], 3),
+    # edge cases
+    ('ep pinned', '3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1', [18, 92, 1670, 10138, 185429], 5),
+    ('ep evasion', '8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1', [13, 102, 1266, 10276, 135655], 5),
+    ('ep discovered', '8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1', [15, 126, 1928, 13931, 206379], 5),
+    ('castle rights', 'r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1', [26, 1141, 27826], 3),
+    ('castle blocked', 'r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1', [44, 1494, 50509], 3),
+    ('promote out of check', '2K2r2/4P3/8/8/8/8/8/3k4 w - - 0 1', [11, 133, 1442, 19174, 266199], 5),
+    ('underpromote check', '8/P1k5/K7/8/8/8/8/8 w - - 0 1', [6, 27, 273, 1329, 18135], 5),
+    ('promote stalemate', 'K1k5/8/P7/8/8/8/8/8 w - - 0 1', [2, 6, 13, 63, 382, 2217], 6),
+    ('promotions', 'n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1', [24, 496, 9483, 182838], 4),
+    ('double check', '8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1', [37, 183, 6559, 23527], 4),
+]
+
+def uci(code):
+    # long algebraic, the notation other engines print for divide
+    def square(sq):
+        return 'abcdefgh'[sq & 7] + str(8 - (sq >> 3))
+    s = square(code & 63) + square((code >> 6) & 63)
+    if code >> 12 & FLAG_PROMOTION:
+        s += PROMOTION_PIECES[(code >> 12) & 3].lower()
+    return s
+
+def perft(gs, depth):
+    # leaves are counted without being made, like most engines' perft
+    if depth == 0:
+        return 1
+    moves = gs.getLegalMoves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        gs.pushMove(move)
+        nodes += perft(gs, depth - 1)
+        gs.popMove()
+    return nodes
+
+def divide(gs, depth):
+    # {uci move: nodes below it}
+    counts = {}
+    for move in gs.getLegalMoves():
+        gs.pushMove(move)
+        counts[uci(move)] = perft(gs, depth - 1)
+        gs.popMove()
+    return counts
+
+def runSuite(maxDepth=None):
+    # returns {name: (depth, nodes, seconds)}, raises AssertionError on a wrong count
+    results = {}
+    for name, fen, counts, depth in SUITE:
+        if maxDepth is not None:
+            depth = min(maxDepth, len(counts))
+        gs = engine.ChessEngine(fen)
+        t = time.perf_counter()
+        nodes = perft(gs, depth)
+        elapsed = time.perf_counter() - t
+        assert nodes == counts[depth - 1], f"{name} depth {depth}: {nodes} nodes, expected {counts[depth - 1]}"
+        results[name] = (depth, nodes, elapsed)
+    return results
+
+def loadBaseline():
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH) as f:
+        return json.load(f)
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="perft suite and divide for ChessEngine")
+    parser.add_argument('command', nargs='?', default='suite', choices=('suite', 'divide'))
+    parser.add_argument('depth', nargs='?', type=int)
+    parser.add_argument('fen', nargs='*', help="divide only, the start position by default")
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    if args.command == 'divide':
+        gs = engine.ChessEngine(' '.join(args.fen) or START_FEN)
+        t = time.perf_counter()
+        counts = divide(gs, args.depth or 1)
+        elapsed = time.perf_counter() - t
+        for move in sorted(counts):
+            print(f"{move}: {counts[move]}")
+        total = sum(counts.values())
+        print(f"\n{len(counts)} moves, {total} nodes, {elapsed:.2f}s")
+        return 0
+
+    baseline = loadBaseline()
+    results = runSuite(args.depth)
+    totalNodes = totalTime = 0
+    for name, (depth, nodes, elapsed) in results.items():
+        nps = nodes / elapsed
+        totalNodes += nodes
+        totalTime += elapsed
+        line = f"  {name:22} d{depth} {nodes:9} nodes {elapsed:6.2f}s {nps:9.0f} nps"
+        if name in baseline and baseline[name]['depth'] == depth:
+            line += f"  x{nps / baseline[name]['nps']:.2f} vs baseline"
+        print(line)
+    print(f"  all counts correct, {totalNodes} nodes {totalTime:.2f}s {totalNodes / totalTime:.0f} nps", end='')
+    sameDepths = all(name in baseline and baseline[name]['depth'] == depth
+                     for name, (depth, _, _) in results.items())
+    if sameDepths and 'total' in baseline:
+        print(f"  x{totalNodes / totalTime / baseline['total']['nps']:.2f} vs baseline")
+    else:
+        print()
+
+    if args.save_baseline:
+        record = {name: {'depth': depth, 'nps': round(nodes / elapsed)}
+                  for name, (depth, nodes, elapsed) in results.items()}
+        record['total'] = {'depth': None, 'nps': round(totalNodes / totalTime)}
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(record, f, indent=2)
+        print(f"baseline saved to {BASELINE_PATH}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
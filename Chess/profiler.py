@@ -0,0 +1,96 @@
+# Opt-in call counts and cumulative time for ChessEngine's hot paths, split by caller,
+# e.g. whether isSquareAttacked time goes to the renderer, notation, castling or legality checks.
+# enable() replaces the methods on the class with timing wrappers and disable() puts the originals
+# back, so a disabled profiler costs nothing. CHESS_PROFILE=1 enables it when engine is imported,
+# in every process, with a summary printed at exit; main.py also prints one at game end.
+#   CHESS_PROFILE=1 python Chess/main.py
+#   profiler.enable(); ...; print(profiler.summary())
+import atexit
+import functools
+import os
+import sys
+import time
+
+ENV_VAR = 'CHESS_PROFILE'
+# the UI's entry points, then what the bots' searches run on
+HOOKED = ('getValidMoves', 'isSquareAttacked', 'makeMove', 'undoMove', 'getMoveNotation',
+          'getLegalMoves', 'pushMove', 'popMove', '_attackersTo', 'evaluate')
+
+_originals = {}  # method name -> the unwrapped function
+_calls = {}  # method name -> {caller: [calls, seconds]}
+
+def _wrap(name, fn):
+    callers = _calls.setdefault(name, {})
+
+    @functools.wraps(fn)
+    def timed(*args, **kwargs):
+        frame = sys._getframe(1)
+        caller = f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}"
+        t = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - t
+            record = callers.get(caller)
+            if record is None:
+                callers[caller] = [1, elapsed]
+            else:
+                record[0] += 1
+                record[1] += elapsed
+    return timed
+
+def enable(names=HOOKED):
+    from engine import ChessEngine  # here, engine imports this module when CHESS_PROFILE is set
+    for name in names:
+        if name not in _originals:
+            fn = getattr(ChessEngine, name)
+            _originals[name] = fn
+            setattr(ChessEngine, name, _wrap(name, fn))
+
+def disable():
+    from engine import ChessEngine
+    for name, fn in _originals.items():
+        setattr(ChessEngine, name, fn)
+    _originals.clear()
+
+def enabled():
+    return bool(_originals)
+
+def reset():
+    for callers in _calls.values():
+        callers.clear()
+
+def stats():
+    # {method: {'calls': n, 'time': seconds, 'callers': {caller: (calls, seconds)}}}
+    # times are inclusive, e.g. getMoveNotation's include the isSquareAttacked calls it makes
+    result = {}
+    for name, callers in _calls.items():
+        if callers:
+            result[name] = {
+                'calls':   sum(calls for calls, _ in callers.values()),
+                'time':    sum(seconds for _, seconds in callers.values()),
+                'callers': {caller: tuple(record) for caller, record in callers.items()},
+            }
+    return result
+
+def summary(title='engine profile'):
+    lines = [f"{title} (pid {os.getpid()})"]
+    profile = stats()
+    if not profile:
+        lines.append("  no calls recorded")
+    for name, entry in sorted(profile.items(), key=lambda item: -item[1]['time']):
+        lines.append(f"  {name:20} {entry['calls']:9} calls {entry['time']:8.3f}s "
+                     f"{entry['time'] / entry['calls'] * 1e6:8.1f}us/call")
+        for caller, (calls, seconds) in sorted(entry['callers'].items(), key=lambda item: -item[1][1]):
+            lines.append(f"      {caller:36} {calls:9} calls {seconds:8.3f}s")
+    return '\n'.join(lines)
+
+def report(title='engine profile', file=None):
+    # print the summary, stderr by default so it doesn't mix with a tool's own output
+    print(summary(title), file=file or sys.stderr)
+
+def enableFromEnv():
+    # called by engine on import
+    if os.environ.get(ENV_VAR, '') not in ('', '0') and not enabled():
+        enable()
+        atexit.register(report)
@@ -0,0 +1,129 @@
+# Fixed-size transposition table keyed by ChessEngine.zobristKey.
+# Buckets of two slots: the first keeps the deepest entry (depth-preferred),
+# the second is always replaced, so fresh shallow results still get stored.
+
+EXACT = 0
+LOWER = 1  # score is a lower bound (beta cutoff)
+UPPER = 2  # score is an upper bound (failed low)
+
+# rough CPython cost of one stored tuple (key, depth, bound, score, move, generation) plus its slot
+ENTRY_BYTES = 144
+
+class TranspositionTable:
+    def __init__(self, sizeMB=16):
+        buckets = max(1, sizeMB * 1024 * 1024 // (2 * ENTRY_BYTES))
+        # round down to a power of two so the index is a mask
+        self.bucketMask = (1 << (buckets.bit_length() - 1)) - 1
+        self.sizeMB = sizeMB
+        self.clear()
+
+    def clear(self):
+        self.slots = [None] * (2 * (self.bucketMask + 1))
+        self.generation = 0
+        self.resetStats()
+
+    def resetStats(self):
+        self.probes = 0
+        self.hits = 0
+        self.cutoffs = 0  # counted by the search when an entry ends a node
+        self.stores = 0
+
+    def newSearch(self):
+        # entries from earlier moves stay usable but lose their depth-preferred protection
+        self.generation += 1
+
+    def probe(self, key):
+        # returns (depth, bound, score, move) or None
+        self.probes += 1
+        i = (key & self.bucketMask) << 1
+        slots = self.slots
+        entry = slots[i]
+        if entry is None or entry[0] != key:
+            entry = slots[i + 1]
+            if entry is None or entry[0] != key:
+                return None
+        self.hits += 1
+        return entry[1:5]
+
+    def store(self, key, depth, bound, score, move):
+        self.stores += 1
+        i = (key & self.bucketMask) << 1
+        entry = (key, depth, bound, score, move, self.generation)
+        old = self.slots[i]
+        if old is None or old[0] == key or depth >= old[1] or old[5] != self.generation:
+            self.slots[i] = entry
+        else:
+            self.slots[i + 1] = entry
+
+    def stats(self):
+        return {
+            'probes':     self.probes,
+            'hits':       self.hits,
+            'cutoffs':    self.cutoffs,
+            'stores':     self.stores,
+            'hitRate':    self.hits / self.probes if self.probes else 0.0,
+            'cutoffRate': self.cutoffs / self.probes if self.probes else 0.0,
+        }
+
+# Same table in shared memory, for Lazy SMP helpers searching alongside the main process (parallel.py).
+# A slot is two uint64 words, key ^ data and data: a slot torn by a concurrent write fails the
+# key check and reads as a miss, so no locks are needed.
+SLOT_BYTES = 16
+SCORE_OFFSET = 1 << 23  # scores are stored in 24 bits
+
+def _pack(depth, bound, score, move, generation):
+    # scores come node-relative from bot.ttStore, mate scores included, so they need no ply here
+    score = min(max(int(score), -SCORE_OFFSET), SCORE_OFFSET - 1) + SCORE_OFFSET
+    return min(depth, 255) | bound << 8 | score << 10 | move << 34 | (generation & 255) << 50
+
+class SharedTranspositionTable(TranspositionTable):
+    def __init__(self, sizeMB=16, name=None):
+        # name - attach to a table another process created, None creates a new one
+        from multiprocessing import shared_memory
+        buckets = max(1, sizeMB * 1024 * 1024 // (2 * SLOT_BYTES))
+        self.bucketMask = (1 << (buckets.bit_length() - 1)) - 1
+        self.sizeMB = sizeMB
+        size = 2 * (self.bucketMask + 1) * SLOT_BYTES
+        self.owner = name is None
+        # helpers are spawned by the owner and share its resource tracker, only the owner unlinks
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self.name = self.shm.name
+        self.words = self.shm.buf.cast('Q')
+        self.generation = 0
+        self.resetStats()
+        if self.owner:
+            self.clear()
+
+    def clear(self):
+        self.shm.buf[:] = bytes(len(self.shm.buf))
+        self.generation = 0
+        self.resetStats()
+
+    def close(self):
+        self.words.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def probe(self, key):
+        self.probes += 1
+        words = self.words
+        i = (key & self.bucketMask) << 2
+        data = words[i + 1]
+        if words[i] ^ data != key:
+            data = words[i + 3]
+            if words[i + 2] ^ data != key:
+                return None
+        self.hits += 1
+        return data & 255, (data >> 8) & 3, ((data >> 10) & 0xFFFFFF) - SCORE_OFFSET, (data >> 34) & 0xFFFF
+
+    def store(self, key, depth, bound, score, move):
+        self.stores += 1
+        words = self.words
+        i = (key & self.bucketMask) << 2
+        data = _pack(depth, bound, score, move, self.generation)
+        old = words[i + 1]
+        if words[i] ^ old == key or depth >= old & 255 or (old >> 50) != self.generation & 255:
+            words[i], words[i + 1] = key ^ data, data
+        else:
+            words[i + 2], words[i + 3] = key ^ data, data